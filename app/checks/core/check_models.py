@@ -5,6 +5,7 @@ from decimal import Decimal
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 
 from core import models
 
@@ -84,6 +85,26 @@ class ModelTests():
 
         assert str(ingrdient) == ingrdient_name
 
+    def test_tag_name_unique_per_user(self):
+        """Test a user cannot hold two tags with the same name"""
+        user = create_user()
+        other_user = create_user(email="other@mail.com")
+        models.Tag.objects.create(user=user, name="Tag1")
+        models.Tag.objects.create(user=other_user, name="Tag1")
+
+        with pytest.raises(IntegrityError):
+            models.Tag.objects.create(user=user, name="Tag1")
+
+    def test_ingredient_name_unique_per_user(self):
+        """Test a user cannot hold two ingredients with the same name"""
+        user = create_user()
+        other_user = create_user(email="other@mail.com")
+        models.Ingredient.objects.create(user=user, name="Salt")
+        models.Ingredient.objects.create(user=other_user, name="Salt")
+
+        with pytest.raises(IntegrityError):
+            models.Ingredient.objects.create(user=user, name="Salt")
+
     def test_recipe_file_name_uuild(self, mocker):
         """Test generate image path"""
         uuid = "test_uuid"
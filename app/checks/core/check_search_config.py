@@ -0,0 +1,21 @@
+"""
+Test system checks of the database setup
+"""
+from core.checks import check_search_config
+
+import pytest
+
+
+@pytest.mark.django_db(True)
+class TestSearchConfigCheck:
+    """Test search_vector trigger config check"""
+
+    def test_trigger_matches_config(self):
+        assert check_search_config(None, databases=["default"]) == []
+
+    def test_changed_config_warns(self, mocker):
+        mocker.patch("core.checks.SEARCH_CONFIG", "simple")
+
+        errors = check_search_config(None, databases=["default"])
+
+        assert [error.id for error in errors] == ["core.W001"]
@@ -0,0 +1,153 @@
+"""
+Test delete_orphans command
+"""
+from decimal import Decimal
+from io import StringIO
+from threading import Thread
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import (
+    connections,
+    transaction,
+)
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from core.signals import orphans_deleted
+from recipe.bulk import resolve_names
+from recipe.caching import get_data_version
+
+import pytest
+
+
+@pytest.fixture
+def user(db):
+    return get_user_model().objects.create_user(
+        email="test@mail.com",
+        password="password",
+    )
+
+
+@pytest.fixture
+def recipe(user):
+    return Recipe.objects.create(
+        user=user,
+        title="Curry",
+        time_minutes=30,
+        price=Decimal("5.00"),
+    )
+
+
+def call(*args):
+    out = StringIO()
+    call_command("delete_orphans", *args, stdout=out)
+    return out.getvalue()
+
+
+def test_delete_orphans(user, recipe):
+    linked = Tag.objects.create(user=user, name="Dinner")
+    recipe.tags.add(linked)
+    Tag.objects.create(user=user, name="Unused")
+    Ingredient.objects.create(user=user, name="Salt")
+
+    out = call()
+
+    assert list(Tag.objects.all()) == [linked]
+    assert not Ingredient.objects.exists()
+    assert "Deleted 1 orphaned tags" in out
+    assert "Deleted 1 orphaned ingredients" in out
+
+
+def test_dry_run_keeps_orphans(user):
+    Tag.objects.create(user=user, name="Unused")
+
+    out = call("--dry-run")
+
+    assert Tag.objects.count() == 1
+    assert "Found 1 orphaned tags" in out
+
+
+def test_user_scope(user):
+    other = get_user_model().objects.create_user(
+        email="other@mail.com",
+        password="password",
+    )
+    Tag.objects.create(user=user, name="Unused")
+    kept = Tag.objects.create(user=other, name="Unused")
+
+    call("--user", "test@mail.com")
+
+    assert list(Tag.objects.all()) == [kept]
+
+
+def test_unknown_user(db):
+    with pytest.raises(CommandError):
+        call("--user", "nobody@mail.com")
+
+
+def test_delete_in_batches(user, mocker, django_assert_num_queries):
+    mock_sleep = mocker.patch("time.sleep")
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f"tag {i}") for i in range(5)
+    )
+
+    # Three tag batches and one empty ingredient batch
+    with django_assert_num_queries(4):
+        call("--batch-size", "2", "--sleep", "0.5")
+
+    assert not Tag.objects.exists()
+    # No pause after the last, short batch
+    assert mock_sleep.call_count == 2
+    mock_sleep.assert_called_with(0.5)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_orphan_being_linked_is_kept(user, recipe):
+    Tag.objects.create(user=user, name="Dinner")
+    out = StringIO()
+
+    def run():
+        try:
+            call_command("delete_orphans", stdout=out)
+        finally:
+            connections.close_all()
+
+    with transaction.atomic():
+        tag = resolve_names(Tag, user, ["Dinner"])["Dinner"]
+        # The command runs on a database connection of its own
+        thread = Thread(target=run)
+        thread.start()
+        thread.join()
+        recipe.tags.add(tag)
+
+    assert "Deleted 0 orphaned tags" in out.getvalue()
+    assert list(recipe.tags.all()) == [tag]
+
+
+def test_delete_sends_orphans_deleted(user, mocker):
+    handler = mocker.MagicMock()
+    orphans_deleted.connect(handler)
+    Tag.objects.create(user=user, name="Unused")
+
+    try:
+        call()
+    finally:
+        orphans_deleted.disconnect(handler)
+
+    handler.assert_called_once()
+    assert handler.call_args.kwargs["sender"] is Tag
+    assert handler.call_args.kwargs["user_ids"] == {user.id}
+
+
+def test_delete_bumps_data_version(user):
+    Tag.objects.create(user=user, name="Unused")
+    version = get_data_version(user.id)
+
+    call()
+
+    assert get_data_version(user.id) != version
@@ -0,0 +1,148 @@
+"""
+Test merge_duplicates command
+"""
+from decimal import Decimal
+from io import StringIO
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.caching import get_data_version
+
+import pytest
+
+
+@pytest.fixture
+def user(db):
+    return get_user_model().objects.create_user(
+        email="test@mail.com",
+        password="password",
+    )
+
+
+def make_recipe(user, *ingredients):
+    recipe = Recipe.objects.create(
+        user=user,
+        title="Curry",
+        time_minutes=30,
+        price=Decimal("5.00"),
+    )
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+def call(*args):
+    out = StringIO()
+    call_command("merge_duplicates", *args, stdout=out)
+    return out.getvalue()
+
+
+def test_merge_case_and_whitespace(user):
+    kept = Ingredient.objects.create(user=user, name="Tomato")
+    spaced = Ingredient.objects.create(user=user, name="tomato ")
+    upper = Ingredient.objects.create(user=user, name="TOMATO")
+    onion = Ingredient.objects.create(user=user, name="Onion")
+    r1 = make_recipe(user, spaced, onion)
+    r2 = make_recipe(user, kept, upper)
+
+    out = call()
+
+    assert sorted(Ingredient.objects.values_list("name", flat=True)) == [
+        "Onion",
+        "Tomato",
+    ]
+    assert set(r1.ingredients.all()) == {kept, onion}
+    assert list(r2.ingredients.all()) == [kept]
+    assert "Merged 2 duplicate ingredients" in out
+
+
+def test_merge_locks_duplicates_first(user):
+    Tag.objects.create(user=user, name="Vegan")
+    Tag.objects.create(user=user, name="vegan")
+
+    with CaptureQueriesContext(connection) as queries:
+        call()
+
+    sql = [query["sql"] for query in queries]
+    lock = next(i for i, q in enumerate(sql) if "FOR UPDATE" in q)
+    move = next(i for i, q in enumerate(sql) if q.startswith("INSERT"))
+    assert lock < move
+
+
+def test_kept_row_has_clean_name(user):
+    spaced = Ingredient.objects.create(user=user, name=" salt")
+    kept = Ingredient.objects.create(user=user, name="Salt")
+    make_recipe(user, spaced)
+    make_recipe(user, spaced)
+
+    call()
+
+    assert list(Ingredient.objects.all()) == [kept]
+    assert kept.recipe_set.count() == 2
+
+
+def test_fold_plurals(user):
+    for name in ["tomato", "Tomatoes", "berry", "berries", "glass"]:
+        Ingredient.objects.create(user=user, name=name)
+
+    call()
+    assert Ingredient.objects.count() == 5
+
+    call("--fold-plurals")
+    assert sorted(Ingredient.objects.values_list("name", flat=True)) == [
+        "berry",
+        "glass",
+        "tomato",
+    ]
+
+
+def test_dry_run_keeps_duplicates(user):
+    Tag.objects.create(user=user, name="Vegan")
+    Tag.objects.create(user=user, name="vegan")
+
+    out = call("--dry-run")
+
+    assert Tag.objects.count() == 2
+    assert "Found 1 duplicate tags" in out
+
+
+def test_users_not_merged(user):
+    other = get_user_model().objects.create_user(
+        email="other@mail.com",
+        password="password",
+    )
+    Tag.objects.create(user=user, name="Vegan")
+    Tag.objects.create(user=user, name="vegan")
+    Tag.objects.create(user=other, name="Vegan")
+    Tag.objects.create(user=other, name="vegan")
+
+    call("--user", "test@mail.com")
+
+    assert Tag.objects.filter(user=user).count() == 1
+    assert Tag.objects.filter(user=other).count() == 2
+
+
+def test_merge_refreshes_cards(user):
+    kept = Ingredient.objects.create(user=user, name="Salt")
+    make_recipe(user, kept)
+    recipe = make_recipe(
+        user,
+        Ingredient.objects.create(user=user, name="salt"),
+    )
+    version = get_data_version(user.id)
+
+    call()
+
+    recipe.refresh_from_db()
+    assert json.loads(recipe.card)["ingredients"] == [
+        {"id": kept.id, "name": "Salt"},
+    ]
+    assert get_data_version(user.id) != version
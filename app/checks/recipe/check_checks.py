@@ -0,0 +1,33 @@
+"""
+Test system checks of recipe API settings
+"""
+from recipe.checks import check_recipe_cache_shared
+
+
+class TestRecipeCacheCheck:
+    """Test recipe cache backend check"""
+
+    def test_process_local_cache_warns(self, settings):
+        settings.CACHES = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            },
+        }
+
+        errors = check_recipe_cache_shared(None)
+
+        assert [error.id for error in errors] == ["recipe.W001"]
+
+    def test_shared_cache_passes(self, settings):
+        settings.CACHES = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            },
+            "shared": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "recipe_cache",
+            },
+        }
+        settings.RECIPE_CACHE = "shared"
+
+        assert check_recipe_cache_shared(None) == []
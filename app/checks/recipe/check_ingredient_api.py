@@ -4,6 +4,8 @@ Test Ingredient API
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -15,11 +17,14 @@ from core.models import (
 )
 
 from recipe.serializers import IngredientSerializer
+from recipe.views import trigram_installed
 
 import pytest
 
 
 INGREDIENTS_URL = reverse("recipe:ingredient-list")
+AUTOCOMPLETE_URL = reverse("recipe:ingredient-autocomplete")
+MERGE_URL = reverse("recipe:ingredient-merge-duplicates")
 
 
 def create_recipe(user, **params):
@@ -83,7 +88,7 @@ class PrivateIngredientAPITests():
         ingredients = Ingredient.objects.all().order_by("-name")
         serializer = IngredientSerializer(ingredients, many=True)
 
-        assert res.data == serializer.data
+        assert res.data["results"] == serializer.data
 
     def test_retrive_ingredient_only_to_correct_user(self, set_up):
         """Test get ingredient only for correct auth user"""
@@ -95,9 +100,9 @@ class PrivateIngredientAPITests():
 
         assert res.status_code == status.HTTP_200_OK
 
-        assert len(res.data) == 1
-        assert res.data[0]["name"] == ingredient.name
-        assert res.data[0]["id"] == ingredient.id
+        assert len(res.data["results"]) == 1
+        assert res.data["results"][0]["name"] == ingredient.name
+        assert res.data["results"][0]["id"] == ingredient.id
 
     def test_update_ingredient(self, set_up):
         """Test update INgredient"""
@@ -112,6 +117,24 @@ class PrivateIngredientAPITests():
         ingredient.refresh_from_db()
         assert ingredient.name == payload["name"]
 
+    def test_update_ingredient_duplicate_name(self, set_up):
+        """Test renaming to a name the user already has is rejected"""
+        Ingredient.objects.create(user=self.user, name="Dessert")
+        Ingredient.objects.create(
+            user=create_user(email="other@mail.com"),
+            name="Soup",
+        )
+        ingredient = Ingredient.objects.create(user=self.user, name="vanilla")
+
+        res = self.client.patch(detail_url(ingredient.id), {"name": "Dessert"})
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+        res = self.client.patch(detail_url(ingredient.id), {"name": "vanilla"})
+        assert res.status_code == status.HTTP_200_OK
+
+        res = self.client.patch(detail_url(ingredient.id), {"name": "Soup"})
+        assert res.status_code == status.HTTP_200_OK
+
     def test_delete_ingredient(self, set_up):
         """Test delete ingrdient"""
         ingredient = Ingredient.objects.create(user=self.user, name="vanilla")
@@ -139,8 +162,8 @@ class PrivateIngredientAPITests():
         s1 = IngredientSerializer(ingredient1)
         s2 = IngredientSerializer(ingredient2)
 
-        assert s1.data in res.data
-        assert s2.data not in res.data
+        assert s1.data in res.data["results"]
+        assert s2.data not in res.data["results"]
 
     def test_filter_ingredient_unique(self, set_up):
         """Test filtered ing return unique val"""
@@ -155,4 +178,81 @@ class PrivateIngredientAPITests():
 
         assert res.status_code == status.HTTP_200_OK
 
-        assert len(res.data) == 1
+        assert len(res.data["results"]) == 1
+
+    def test_search_ingredients(self, set_up):
+        """Test search returns matching ingredients, most similar first"""
+        Ingredient.objects.create(user=self.user, name="Tomato")
+        Ingredient.objects.create(user=self.user, name="Potato")
+        Ingredient.objects.create(user=self.user, name="Dessert")
+        other_user = create_user(email="other@mail.com")
+        Ingredient.objects.create(user=other_user, name="Tomato")
+
+        res = self.client.get(INGREDIENTS_URL, {"search": "toma"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [t["name"] for t in res.data["results"]] == ["Tomato"]
+        assert res.data["next"] is None
+
+    def test_search_ingredients_with_typo(self, set_up):
+        """Test search tolerates typos"""
+        if not trigram_installed():
+            pytest.skip("pg_trgm is not installed")
+        Ingredient.objects.create(user=self.user, name="tomato")
+
+        res = self.client.get(INGREDIENTS_URL, {"search": "tomatoe"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [t["name"] for t in res.data["results"]] == ["tomato"]
+
+    def test_autocomplete_ingredients(self, set_up):
+        """Test autocomplete returns user ingredients starting with prefix"""
+        Ingredient.objects.create(user=self.user, name="Tomato")
+        Ingredient.objects.create(user=self.user, name="tofu")
+        Ingredient.objects.create(user=self.user, name="Dessert")
+        other_user = create_user(email="other@mail.com")
+        Ingredient.objects.create(user=other_user, name="Tomatillo")
+
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "TO"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [t["name"] for t in res.data] == ["tofu", "Tomato"]
+
+    def test_filter_ingredient_assigned_with_exists(self, set_up):
+        """Test assigned_only filters with a semi-join, not DISTINCT"""
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(ingredient)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(INGREDIENTS_URL, {"assigned_only": 1})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(res.data["results"]) == 1
+        assert "EXISTS" in queries[0]["sql"]
+        assert "DISTINCT" not in queries[0]["sql"]
+
+    def test_ingredients_paginated_by_name(self, set_up):
+        """Test ingredient pages follow the name ordering with a cursor"""
+        for name in ["Apple", "Basil", "Cumin"]:
+            Ingredient.objects.create(user=self.user, name=name)
+
+        res = self.client.get(INGREDIENTS_URL, {"page_size": 2})
+        names = [item["name"] for item in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        names += [item["name"] for item in res.data["results"]]
+
+        assert res.status_code == status.HTTP_200_OK
+        assert names == ["Cumin", "Basil", "Apple"]
+        assert res.data["next"] is None
+
+    def test_merge_duplicate_ingredients_fold_plurals(self, set_up):
+        """Test merging plural ingredients into their singular"""
+        kept = Ingredient.objects.create(user=self.user, name="Tomato")
+        Ingredient.objects.create(user=self.user, name="tomatoes")
+
+        res = self.client.post(MERGE_URL, {"fold_plurals": True})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data == {"merged": 1}
+        assert list(Ingredient.objects.all()) == [kept]
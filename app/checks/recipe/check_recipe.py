@@ -2,12 +2,18 @@
 Test Recipe API
 """
 from decimal import Decimal
+import json
 import tempfile
 import os
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+)
 from django.urls import reverse
 
 from rest_framework import status
@@ -23,10 +29,26 @@ from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer,
 )
+from recipe.caching import (
+    bump_data_version,
+    get_cache_stats,
+    get_data_version,
+)
+from recipe.cards import (
+    refresh_cards,
+    store_cards,
+)
+from recipe.pagination import RecipeCursorPagination
+from recipe.views import RecipeViewSet
 
 import pytest
 
 RECIPES_URL = reverse("recipe:recipe-list")
+FACETS_URL = reverse("recipe:recipe-facets")
+EXPORT_URL = reverse("recipe:recipe-export")
+IMPORT_URL = reverse("recipe:recipe-import")
+BULK_URL = reverse("recipe:recipe-bulk")
+BATCH_URL = reverse("recipe:recipe-batch")
 
 
 def detail_url(recipe_id):
@@ -96,7 +118,7 @@ class PrivateRecipeAPITests():
         recipe_list_serialized = RecipeSerializer(recipes, many=True)
 
         assert res.status_code == status.HTTP_200_OK
-        assert res.data == recipe_list_serialized.data
+        assert res.data["results"] == recipe_list_serialized.data
 
     def test_recipe_list_limited_to_user(self, set_up):
         """Test list of recipe is limited to auth user"""
@@ -114,7 +136,7 @@ class PrivateRecipeAPITests():
         recipe_list_serialized = RecipeSerializer(recipes, many=True)
 
         assert res.status_code == status.HTTP_200_OK
-        assert res.data == recipe_list_serialized.data
+        assert res.data["results"] == recipe_list_serialized.data
 
     def test_get_recipe_detail(self, set_up):
         """test get recipe Details"""
@@ -257,6 +279,22 @@ class PrivateRecipeAPITests():
             ).exists()
             assert exists
 
+    def test_create_tags_in_request_order(self, set_up):
+        """Test new tags are inserted in the order they were sent"""
+        names = [f"Tag {i}" for i in range(20, 0, -1)]
+        payload = {
+            "title": "Thai Prawn curry",
+            "time_minutes": 30,
+            "price": Decimal("10.5"),
+            "tags": [{"name": name} for name in names + names[:5]],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_201_CREATED
+        tags = Tag.objects.filter(user=self.user).order_by("id")
+        assert list(tags.values_list("name", flat=True)) == names
+
     def test_create_recipe_with_existing_tag(self, set_up):
         """Test recipe creation with existing tag"""
         tag_indian = Tag.objects.create(user=self.user, name="Indian")
@@ -480,9 +518,9 @@ class PrivateRecipeAPITests():
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        assert s1.data in res.data
-        assert s2.data in res.data
-        assert s3.data not in res.data
+        assert s1.data in res.data["results"]
+        assert s2.data in res.data["results"]
+        assert s3.data not in res.data["results"]
 
     def test_filter_by_ingredient(self, set_up):
         """TEst filter recipe by ingredient"""
@@ -504,9 +542,890 @@ class PrivateRecipeAPITests():
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        assert s1.data in res.data
-        assert s2.data in res.data
-        assert s3.data not in res.data
+        assert s1.data in res.data["results"]
+        assert s2.data in res.data["results"]
+        assert s3.data not in res.data["results"]
+
+    def test_filter_by_many_tags_unique(self, set_up):
+        """Test recipe matching several filter tags is returned once"""
+        r1 = create_recipe(user=self.user, title="recipe1")
+        tag1 = Tag.objects.create(user=self.user, name="tag1")
+        tag2 = Tag.objects.create(user=self.user, name="tag2")
+        r1.tags.add(tag1, tag2)
+
+        params = {
+            "tags": f"{tag1.id},{tag2.id}"
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(res.data["results"]) == 1
+        assert res.data["results"][0]["id"] == r1.id
+        assert "DISTINCT" not in queries[0]["sql"]
+        assert "EXISTS" in queries[0]["sql"]
+
+    def test_filter_by_all_tags(self, set_up):
+        """Test filter recipe having all requested tags"""
+        r1 = create_recipe(user=self.user, title="recipe1")
+        r2 = create_recipe(user=self.user, title="recipe2")
+        tag1 = Tag.objects.create(user=self.user, name="tag1")
+        tag2 = Tag.objects.create(user=self.user, name="tag2")
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+
+        params = {
+            "tags": f"{tag1.id},{tag2.id}",
+            "tags_mode": "all",
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [r["id"] for r in res.data["results"]] == [r1.id]
+
+    def test_filter_by_all_ingredients(self, set_up):
+        """Test filter recipe having all requested ingredients"""
+        r1 = create_recipe(user=self.user, title="recipe1")
+        r2 = create_recipe(user=self.user, title="recipe2")
+        ingredient1 = Ingredient.objects.create(user=self.user, name="ing1")
+        ingredient2 = Ingredient.objects.create(user=self.user, name="ing2")
+        r1.ingredients.add(ingredient1, ingredient2)
+        r2.ingredients.add(ingredient2)
+
+        params = {
+            "ingredients": f"{ingredient1.id},{ingredient2.id}",
+            "ingredients_mode": "all",
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [r["id"] for r in res.data["results"]] == [r1.id]
+
+    def test_filter_invalid_mode(self, set_up):
+        """Test unknown filter mode is rejected"""
+        params = {
+            "tags": "1",
+            "tags_mode": "some",
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_recipes_paginated_by_cursor(self, set_up):
+        """Test walking recipe pages by cursor returns every recipe once"""
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {"page_size": 2})
+        while True:
+            assert res.status_code == status.HTTP_200_OK
+            assert len(res.data["results"]) <= 2
+            ids.extend(r["id"] for r in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get(res.data["next"])
+
+        assert ids == [r.id for r in reversed(recipes)]
+
+    def test_recipes_page_size_capped(self, set_up, mocker):
+        """Test page size cannot exceed the maximum"""
+        for _ in range(3):
+            create_recipe(user=self.user)
+
+        mocker.patch.object(RecipeCursorPagination, "max_page_size", 2)
+        res = self.client.get(RECIPES_URL, {"page_size": 1000})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(res.data["results"]) == 2
+        assert res.data["next"] is not None
+
+    def test_list_sparse_fields(self, set_up):
+        """Test list returns and loads only requested fields"""
+        recipe = create_recipe(user=self.user)
+
+        params = {"fields": "id,title,price"}
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data["results"] == [{
+            "id": recipe.id,
+            "title": recipe.title,
+            "price": str(recipe.price),
+        }]
+        assert len(queries) == 1
+        assert "description" not in queries[0]["sql"]
+
+    def test_retrieve_sparse_fields(self, set_up):
+        """Test detail returns only requested fields"""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name="Lunch")
+        recipe.tags.add(tag)
+
+        params = {"fields": "description,tags"}
+        res = self.client.get(detail_url(recipe.id), params)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data == {
+            "description": recipe.description,
+            "tags": [{"id": tag.id, "name": tag.name}],
+        }
+
+    def test_sparse_fields_unknown(self, set_up):
+        """Test requesting unknown fields is rejected"""
+        res = self.client.get(RECIPES_URL, {"fields": "id,user"})
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_search_recipes_ranked(self, set_up):
+        """Test search returns title matches before description matches"""
+        r1 = create_recipe(
+            user=self.user,
+            title="Creamy pasta",
+            description="Cook the tomatoes slowly",
+        )
+        r2 = create_recipe(user=self.user, title="Tomato soup")
+        create_recipe(user=self.user, title="Pancakes")
+
+        res = self.client.get(RECIPES_URL, {"q": "tomato"})
+
+        assert res.status_code == status.HTTP_200_OK
+        ids = [r["id"] for r in res.data["results"]]
+        assert ids == [r2.id, r1.id]
+
+    def test_search_recipes_paginated(self, set_up):
+        """Test walking search pages returns every match once"""
+        recipes = [
+            create_recipe(user=self.user, title="Tomato soup"),
+            create_recipe(user=self.user, title="Tomato tomato salad"),
+            create_recipe(user=self.user, description="Add a tomato"),
+        ]
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {"q": "tomato", "page_size": 1})
+        while True:
+            ids.extend(r["id"] for r in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get(res.data["next"])
+
+        assert sorted(ids) == sorted(r.id for r in recipes)
+
+    def test_search_follows_updates(self, set_up):
+        """Test search sees the latest recipe title"""
+        recipe = create_recipe(user=self.user, title="Pancakes")
+
+        self.client.patch(detail_url(recipe.id), {"title": "Waffles"})
+        res = self.client.get(RECIPES_URL, {"q": "waffles"})
+
+        assert len(res.data["results"]) == 1
+        assert res.data["results"][0]["id"] == recipe.id
+
+    def test_search_highlight(self, set_up):
+        """Test search results include highlighted snippet"""
+        create_recipe(user=self.user, description="Simmer the tomato sauce")
+
+        params = {"q": "tomato", "highlight": 1}
+        res = self.client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert "<b>tomato</b>" in res.data["results"][0]["snippet"]
+
+    def test_search_invalid_highlight(self, set_up):
+        """Test highlight flag other than 0 or 1 is rejected"""
+        res = self.client.get(RECIPES_URL, {"q": "tomato", "highlight": "yes"})
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_filter_by_time_and_price(self, set_up):
+        """Test range filters compose with tag filter"""
+        tag = Tag.objects.create(user=self.user, name="Quick")
+        r1 = create_recipe(user=self.user, time_minutes=20, price="8.00")
+        r2 = create_recipe(user=self.user, time_minutes=45, price="8.00")
+        r3 = create_recipe(user=self.user, time_minutes=20, price="12.00")
+        r4 = create_recipe(user=self.user, time_minutes=20, price="4.00")
+        for recipe in [r1, r2, r3, r4]:
+            recipe.tags.add(tag)
+        create_recipe(user=self.user, time_minutes=20, price="8.00")
+
+        params = {
+            "tags": f"{tag.id}",
+            "max_time": 30,
+            "min_price": "5",
+            "max_price": "10.00",
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [r["id"] for r in res.data["results"]] == [r1.id]
+
+    def test_filter_by_invalid_range(self, set_up):
+        """Test non numeric range filters are rejected"""
+        for params in [
+            {"max_time": "1.5"},
+            {"max_price": "cheap"},
+            {"max_price": "NaN"},
+            {"min_price": "-Infinity"},
+        ]:
+            res = self.client.get(RECIPES_URL, params)
+
+            assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_recipe_facets(self, set_up, django_assert_num_queries):
+        """Test facets count recipes per tag and ingredient"""
+        tag1 = Tag.objects.create(user=self.user, name="Dinner")
+        tag2 = Tag.objects.create(user=self.user, name="Vegan")
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        r1 = create_recipe(user=self.user, time_minutes=10)
+        r2 = create_recipe(user=self.user, time_minutes=10)
+        r3 = create_recipe(user=self.user, time_minutes=60)
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+        r3.tags.add(tag2)
+        r3.ingredients.add(ingredient)
+        create_recipe(user=create_user(email="other@mail.com"))
+
+        with django_assert_num_queries(2):
+            res = self.client.get(FACETS_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data["tags"] == [
+            {"id": tag1.id, "name": "Dinner", "count": 2},
+            {"id": tag2.id, "name": "Vegan", "count": 2},
+        ]
+        assert res.data["ingredients"] == [
+            {"id": ingredient.id, "name": "Salt", "count": 1},
+        ]
+
+        res = self.client.get(FACETS_URL, {"max_time": 30})
+
+        assert res.data["tags"] == [
+            {"id": tag1.id, "name": "Dinner", "count": 2},
+            {"id": tag2.id, "name": "Vegan", "count": 1},
+        ]
+        assert res.data["ingredients"] == []
+
+    def test_list_not_modified(self, set_up, django_assert_num_queries):
+        """Test unchanged recipe list is answered with 304"""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL)
+
+        with django_assert_num_queries(0):
+            res = self.client.get(
+                RECIPES_URL,
+                HTTP_IF_NONE_MATCH=res["ETag"],
+            )
+
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+        assert res.content == b""
+
+    def test_retrieve_ignores_modified_since(self, set_up):
+        """Test only the ETag validates cached copies"""
+        recipe = create_recipe(user=self.user)
+        res = self.client.get(detail_url(recipe.id))
+
+        assert "Last-Modified" not in res
+
+        res = self.client.get(
+            detail_url(recipe.id),
+            HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT",
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+
+    def test_etag_changes_on_write(self, set_up):
+        """Test recipe and link writes change the ETag"""
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(RECIPES_URL)["ETag"]
+
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        etag_tag = self.client.get(RECIPES_URL)["ETag"]
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag_tag)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res["ETag"] not in [etag, etag_tag]
+
+    def test_etag_depends_on_query(self, set_up):
+        """Test different query strings get different ETags"""
+        create_recipe(user=self.user)
+        etag = self.client.get(RECIPES_URL)["ETag"]
+
+        res = self.client.get(
+            RECIPES_URL,
+            {"max_time": 5},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data["results"] == []
+
+    def test_list_served_from_cache(
+        self, set_up, django_assert_num_queries
+    ):
+        """Test repeated list reads are served from the response cache"""
+        create_recipe(user=self.user)
+        stats = get_cache_stats()
+        res = self.client.get(RECIPES_URL)
+
+        with django_assert_num_queries(0):
+            cached = self.client.get(RECIPES_URL)
+
+        assert cached.status_code == status.HTTP_200_OK
+        assert cached.content == res.content
+        assert cached["ETag"] == res["ETag"]
+        assert get_cache_stats() == {
+            "hits": stats["hits"] + 1,
+            "misses": stats["misses"] + 1,
+        }
+
+    def test_cache_invalidated_on_write(self, set_up):
+        """Test writes are visible to the next cached read"""
+        recipe = create_recipe(user=self.user, title="Old title")
+        self.client.get(detail_url(recipe.id))
+
+        self.client.patch(detail_url(recipe.id), {"title": "New title"})
+        res = self.client.get(detail_url(recipe.id))
+
+        assert res.json()["title"] == "New title"
+
+    def test_cache_file_backend(
+        self, set_up, django_assert_num_queries
+    ):
+        """Test responses can be cached in a file based backend"""
+        create_recipe(user=self.user)
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(
+                CACHES={
+                    "default": {
+                        "BACKEND": (
+                            "django.core.cache.backends.locmem.LocMemCache"
+                        ),
+                    },
+                    "recipe": {
+                        "BACKEND": (
+                            "django.core.cache.backends.filebased"
+                            ".FileBasedCache"
+                        ),
+                        "LOCATION": location,
+                    },
+                },
+                RECIPE_CACHE="recipe",
+            ):
+                res = self.client.get(RECIPES_URL)
+                with django_assert_num_queries(0):
+                    cached = self.client.get(RECIPES_URL)
+
+                assert os.listdir(location)
+
+        assert cached.content == res.content
+
+    def test_export_recipes_json(self, set_up):
+        """Test export streams every recipe of the user as a JSON array"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        for i in range(3):
+            create_recipe(user=self.user, title=f"Recipe {i}").tags.add(tag)
+        create_recipe(user=create_user(email="other@mail.com"))
+
+        res = self.client.get(EXPORT_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.streaming
+        assert res["Content-Type"] == "application/json"
+        recipes = Recipe.objects.filter(user=self.user).order_by("-id")
+        serializer = RecipeDetailSerializer(recipes, many=True)
+        data = json.loads(b"".join(res.streaming_content))
+        assert data == serializer.data
+
+    def test_export_recipes_ndjson(self, set_up):
+        """Test export streams one recipe per line in NDJSON"""
+        create_recipe(user=self.user, title="Curry", time_minutes=60)
+        create_recipe(user=self.user, title="Salad", time_minutes=5)
+
+        res = self.client.get(
+            EXPORT_URL,
+            {"export_format": "ndjson", "max_time": 30},
+        )
+
+        assert res["Content-Type"] == "application/x-ndjson"
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        assert [json.loads(line)["title"] for line in lines] == [
+            "Salad",
+        ]
+
+    def test_export_queries_per_chunk(
+        self, set_up, mocker, django_assert_num_queries
+    ):
+        """Test export prefetches related names once per chunk"""
+        mocker.patch.object(RecipeViewSet, "export_chunk_size", 2)
+        recipes = [create_recipe(user=self.user) for i in range(5)]
+        for recipe in recipes:
+            recipe.tags.create(user=self.user, name=f"tag {recipe.id}")
+
+        with django_assert_num_queries(7):
+            res = self.client.get(EXPORT_URL)
+            lines = json.loads(b"".join(res.streaming_content))
+
+        assert len(lines) == 5
+
+    def test_export_invalid_format(self, set_up):
+        """Test unknown export formats are rejected"""
+        res = self.client.get(EXPORT_URL, {"export_format": "xml"})
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_import_recipes(self, set_up):
+        """Test NDJSON import creates recipes and reports every line"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        lines = [
+            {
+                "title": "Curry",
+                "time_minutes": 30,
+                "price": "4.50",
+                "description": "Hot",
+                "tags": [{"name": "Vegan"}, {"name": "Dinner"}],
+                "ingredients": [{"name": "Rice"}],
+            },
+            {"title": "No time", "price": "1.00"},
+            {
+                "title": "Soup",
+                "time_minutes": 15,
+                "price": "2.00",
+                "tags": [{"name": "Dinner"}, {"name": "Dinner"}],
+            },
+        ]
+        body = "\n".join(json.dumps(line) for line in lines) + "\n\nnot json\n"
+
+        res = self.client.post(
+            IMPORT_URL,
+            body,
+            content_type="application/x-ndjson",
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data["created"] == 2
+        results = res.data["results"]
+        assert [r["line"] for r in results] == [1, 2, 3, 5]
+        assert "time_minutes" in results[1]["errors"]
+        assert "non_field_errors" in results[3]["errors"]
+        curry = Recipe.objects.get(id=results[0]["id"])
+        assert curry.user == self.user
+        assert curry.description == "Hot"
+        assert sorted(tag.name for tag in curry.tags.all()) == [
+            "Dinner",
+            "Vegan",
+        ]
+        assert curry.ingredients.get().name == "Rice"
+        soup = Recipe.objects.get(id=results[2]["id"])
+        assert soup.tags.get().name == "Dinner"
+        assert Tag.objects.filter(user=self.user).count() == 2
+
+    def test_import_queries_per_chunk(
+        self, set_up, mocker, django_assert_num_queries
+    ):
+        """Test import writes each chunk with a fixed number of queries"""
+        mocker.patch.object(RecipeViewSet, "import_chunk_size", 2)
+        body = "".join(
+            json.dumps({
+                "title": f"Recipe {i}",
+                "time_minutes": 5,
+                "price": "1.00",
+                "tags": [{"name": f"tag {i}"}],
+                "ingredients": [{"name": "Salt"}],
+            }) + "\n"
+            for i in range(4)
+        )
+
+        # Two chunks of eight queries and one card refresh, no savepoints
+        # outside TestCase. The second chunk finds Salt in the identity map
+        # of the request and only locks its row again
+        with django_assert_num_queries(20):
+            res = self.client.post(
+                IMPORT_URL,
+                body,
+                content_type="application/x-ndjson",
+            )
+
+        assert res.data["created"] == 4
+        assert Recipe.objects.filter(user=self.user).count() == 4
+
+    def test_import_visible_to_cached_list(self, set_up):
+        """Test imported recipes are not hidden by the response cache"""
+        self.client.get(RECIPES_URL)
+
+        self.client.post(
+            IMPORT_URL,
+            json.dumps({"title": "Soup", "time_minutes": 5, "price": "1"}),
+            content_type="application/x-ndjson",
+        )
+        res = self.client.get(RECIPES_URL)
+
+        assert len(res.json()["results"]) == 1
+
+    def test_bulk_create_recipes(self, set_up):
+        """Test bulk create adds all recipes in request order"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        payload = [
+            {
+                "title": "Curry",
+                "time_minutes": 30,
+                "price": "4.50",
+                "tags": [{"name": "Vegan"}, {"name": "Dinner"}],
+            },
+            {"title": "Soup", "time_minutes": 10, "price": "2.00"},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_201_CREATED
+        assert [r["title"] for r in res.data] == ["Curry", "Soup"]
+        curry = Recipe.objects.get(id=res.data[0]["id"])
+        assert curry.user == self.user
+        assert sorted(tag.name for tag in curry.tags.all()) == [
+            "Dinner",
+            "Vegan",
+        ]
+        assert Tag.objects.filter(user=self.user).count() == 2
+
+    def test_bulk_create_invalid(self, set_up):
+        """Test bulk create is all or nothing"""
+        payload = [
+            {"title": "Curry", "time_minutes": 30, "price": "4.50"},
+            {"title": "No time", "price": "2.00"},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Recipe.objects.filter(user=self.user).exists()
+
+    def test_bulk_update_recipes(self, set_up):
+        """Test bulk PATCH changes fields and tags of listed recipes"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        r1 = create_recipe(user=self.user, title="Curry")
+        r2 = create_recipe(user=self.user, title="Soup")
+        r3 = create_recipe(user=self.user, title="Salad")
+        r1.tags.add(tag)
+        payload = [
+            {"id": r2.id, "price": "9.99"},
+            {"id": r1.id, "tags": [{"name": "Dinner"}]},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [r["id"] for r in res.data] == [r2.id, r1.id]
+        for recipe in [r1, r2, r3]:
+            recipe.refresh_from_db()
+        assert r2.price == Decimal("9.99")
+        assert r1.price == Decimal("5.99")
+        assert r3.price == Decimal("5.99")
+        assert [t.name for t in r1.tags.all()] == ["Dinner"]
+        assert res.data[1]["tags"][0]["name"] == "Dinner"
+
+    def test_bulk_update_other_user_recipe(self, set_up):
+        """Test bulk PATCH fails as a whole on recipes of other users"""
+        recipe = create_recipe(user=self.user, title="Curry")
+        other = create_recipe(user=create_user(email="other@mail.com"))
+        payload = [
+            {"id": recipe.id, "title": "Changed"},
+            {"id": other.id, "title": "Changed"},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        recipe.refresh_from_db()
+        other.refresh_from_db()
+        assert recipe.title == "Curry"
+        assert other.title != "Changed"
+
+    def test_bulk_delete_by_ids(self, set_up):
+        """Test bulk DELETE removes listed recipes of the user only"""
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+        other = create_recipe(user=create_user(email="other@mail.com"))
+
+        res = self.client.delete(
+            BULK_URL,
+            {"ids": [r1.id, other.id]},
+            format="json",
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data["deleted"] == 1
+        assert not Recipe.objects.filter(id=r1.id).exists()
+        assert Recipe.objects.filter(id=r2.id).exists()
+        assert Recipe.objects.filter(id=other.id).exists()
+
+    def test_bulk_delete_by_filter(self, set_up):
+        """Test bulk DELETE accepts the list filters"""
+        create_recipe(user=self.user, time_minutes=5)
+        slow = create_recipe(user=self.user, time_minutes=60)
+
+        res = self.client.delete(f"{BULK_URL}?max_time=30")
+
+        assert res.data["deleted"] == 1
+        assert list(Recipe.objects.filter(user=self.user)) == [slow]
+
+        res = self.client.delete(BULK_URL)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert Recipe.objects.filter(id=slow.id).exists()
+
+    @pytest.mark.parametrize("query", [
+        "tags=",
+        "tags_mode=all",
+        "ingredients_mode=any",
+        "max_time=",
+        "min_price=&max_price=",
+        "q=",
+    ])
+    def test_bulk_delete_empty_filter_rejected(self, set_up, query):
+        """Test bulk DELETE with empty filters or only modes deletes nothing"""
+        create_recipe(user=self.user)
+        create_recipe(user=self.user)
+
+        res = self.client.delete(f"{BULK_URL}?{query}")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert Recipe.objects.filter(user=self.user).count() == 2
+
+    def test_bulk_boolean_ids_rejected(self, set_up):
+        """Test bulk PATCH and DELETE reject JSON booleans as ids"""
+        recipe = create_recipe(user=self.user, title="Curry")
+
+        res = self.client.patch(
+            BULK_URL,
+            [{"id": True, "title": "Changed"}],
+            format="json",
+        )
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+        res = self.client.delete(BULK_URL, {"ids": [True]}, format="json")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        recipe.refresh_from_db()
+        assert recipe.title == "Curry"
+
+    def test_bulk_batch_size_limited(self, set_up, mocker):
+        """Test bulk requests above the batch size are rejected"""
+        mocker.patch.object(RecipeViewSet, "bulk_max_batch_size", 1)
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+
+        res = self.client.delete(
+            BULK_URL,
+            {"ids": [r1.id, r2.id]},
+            format="json",
+        )
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert Recipe.objects.filter(user=self.user).count() == 2
+
+    def test_batch_recipes(self, set_up, django_assert_num_queries):
+        """Test batch fetch keeps requested order and reports missing ids"""
+        r1 = create_recipe(user=self.user, title="Curry")
+        r2 = create_recipe(user=self.user, title="Soup")
+        r1.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+        other = create_recipe(user=create_user(email="other@mail.com"))
+        ids = [r2.id, other.id, r1.id, 0, r2.id]
+
+        with django_assert_num_queries(3):
+            res = self.client.get(
+                BATCH_URL,
+                {"ids": ",".join(str(pk) for pk in ids)},
+            )
+
+        assert res.status_code == status.HTTP_200_OK
+        serializer = RecipeDetailSerializer([r2, r1], many=True)
+        assert res.data["results"] == serializer.data
+        assert res.data["missing"] == [other.id, 0]
+
+    def test_batch_invalid_ids(self, set_up):
+        """Test batch fetch rejects malformed and too long id lists"""
+        for ids in ["", "1,a", ",".join(str(pk) for pk in range(1, 102))]:
+            res = self.client.get(BATCH_URL, {"ids": ids})
+
+            assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_fast_list_parity(self, set_up, mocker):
+        """Test the fast list path renders the same bytes as serializers"""
+        for i in range(3):
+            recipe = create_recipe(
+                user=self.user,
+                title=f"Spicy curry {i}",
+                price=Decimal(f"{i}.5"),
+                link="" if i else "http://example.com/r",
+            )
+            for j in range(i):
+                recipe.tags.add(Tag.objects.create(
+                    user=self.user,
+                    name=f"tag {i}-{j}",
+                ))
+            recipe.ingredients.add(Ingredient.objects.get_or_create(
+                user=self.user,
+                name="Rice",
+            )[0])
+
+        for params in [{}, {"page_size": 2}, {"q": "curry"}]:
+            fast = self.client.get(RECIPES_URL, params)
+            bump_data_version(self.user.id)
+            mocker.patch.object(RecipeViewSet, "fast_list", False)
+            slow = self.client.get(RECIPES_URL, params)
+            mocker.stopall()
+
+            assert fast.content == slow.content
+            assert fast.status_code == status.HTTP_200_OK
+
+    def test_card_stored_on_create(self, set_up):
+        """Test creating a recipe stores its list card"""
+        payload = {
+            "title": "Curry",
+            "time_minutes": 30,
+            "price": "5.50",
+            "tags": [{"name": "Indian"}],
+            "ingredients": [{"name": "Rice"}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        recipe = Recipe.objects.get(id=res.data["id"])
+        card = json.loads(recipe.card)
+        assert card["title"] == "Curry"
+        assert card["price"] == "5.50"
+        assert [tag["name"] for tag in card["tags"]] == ["Indian"]
+        assert [
+            ingredient["name"] for ingredient in card["ingredients"]
+        ] == ["Rice"]
+
+    def test_card_updated_on_patch(self, set_up):
+        """Test updating a recipe refreshes its card"""
+        recipe = create_recipe(user=self.user)
+
+        self.client.patch(detail_url(recipe.id), {"title": "New title"})
+
+        recipe.refresh_from_db()
+        assert json.loads(recipe.card)["title"] == "New title"
+
+    def test_card_follows_tag_rename(self, set_up):
+        """Test renaming a tag refreshes cards of recipes using it"""
+        tag = Tag.objects.create(user=self.user, name="Dinner")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        self.client.patch(
+            reverse("recipe:tag-detail", args=[tag.id]),
+            {"name": "Supper"},
+        )
+
+        recipe.refresh_from_db()
+        assert json.loads(recipe.card)["tags"] == [
+            {"id": tag.id, "name": "Supper"},
+        ]
+
+    def test_card_drops_deleted_ingredient(self, set_up):
+        """Test deleting an ingredient refreshes cards of recipes using it"""
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(ingredient)
+
+        self.client.delete(
+            reverse("recipe:ingredient-detail", args=[ingredient.id]),
+        )
+
+        recipe.refresh_from_db()
+        assert json.loads(recipe.card)["ingredients"] == []
+
+    def test_list_fills_missing_cards(self, set_up):
+        """Test listing renders and stores cards that were never built"""
+        recipe = create_recipe(user=self.user, title="Soup")
+        Recipe.objects.filter(id=recipe.id).update(card=None)
+
+        res = self.client.get(RECIPES_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data["results"][0]["title"] == "Soup"
+        recipe.refresh_from_db()
+        assert json.loads(recipe.card) == json.loads(res.content)["results"][0]
+
+    def test_write_clears_card(self, set_up, mocker):
+        """Test a write clears the card until it is rendered again"""
+        patched_refresh = mocker.patch("recipe.cards.refresh_cards")
+        recipe = create_recipe(user=self.user)
+        Recipe.objects.filter(id=recipe.id).update(card="{}")
+
+        self.client.patch(detail_url(recipe.id), {"title": "New title"})
+
+        recipe.refresh_from_db()
+        assert recipe.card is None
+        patched_refresh.assert_called_with({recipe.id})
+
+    def test_read_keeps_newer_card(self, set_up):
+        """Test a card rendered on read does not replace a stored one"""
+        recipe = create_recipe(user=self.user, title="Soup")
+
+        store_cards([recipe.id], ['{"title": "Old"}'])
+
+        recipe.refresh_from_db()
+        assert json.loads(recipe.card)["title"] == "Soup"
+
+    def test_card_refresh_bumps_data_version(self, set_up):
+        """Test lists cached with old cards are retired by a refresh"""
+        recipe = create_recipe(user=self.user)
+        version = get_data_version(self.user.id)
+
+        refresh_cards([recipe.id])
+
+        assert get_data_version(self.user.id) != version
+
+    def test_import_looks_up_names_once(self, set_up, mocker):
+        """Test import chunks reuse tags resolved earlier in the request"""
+        mocker.patch.object(RecipeViewSet, "import_chunk_size", 1)
+        body = "".join(
+            json.dumps({
+                "title": f"Recipe {i}",
+                "time_minutes": 5,
+                "price": "1.00",
+                "tags": [{"name": "Dinner"}],
+            }) + "\n"
+            for i in range(3)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(
+                IMPORT_URL,
+                body,
+                content_type="application/x-ndjson",
+            )
+
+        assert res.data["created"] == 3
+        tag_selects = [
+            query for query in queries
+            if query["sql"].startswith("SELECT")
+            and '"core_tag"."name" IN' in query["sql"]
+        ]
+        # Lookup and re-select after insert, both in the first chunk only,
+        # later chunks lock the row by id
+        assert len(tag_selects) == 2
+        assert Tag.objects.filter(user=self.user).count() == 1
+
+    def test_bulk_response_renders_shared_tag_once(self, set_up):
+        """Test recipes sharing a tag reuse its rendered representation"""
+        payload = [
+            {
+                "title": title,
+                "time_minutes": 10,
+                "price": "2.00",
+                "tags": [{"name": "Dinner"}],
+            }
+            for title in ["Curry", "Soup"]
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.data[0]["tags"][0] is res.data[1]["tags"][0]
 
 
 @pytest.mark.django_db(True)
@@ -4,6 +4,8 @@ Test Tag API
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -15,11 +17,17 @@ from core.models import (
 )
 
 from recipe.serializers import TagSerializer
+from recipe.views import (
+    TagViewSet,
+    trigram_installed,
+)
 
 import pytest
 
 
 TAGS_URL = reverse("recipe:tag-list")
+AUTOCOMPLETE_URL = reverse("recipe:tag-autocomplete")
+MERGE_URL = reverse("recipe:tag-merge-duplicates")
 
 
 def create_recipe(user, **params):
@@ -82,7 +90,7 @@ class ProvateTagApiTests():
         serializer = TagSerializer(tags, many=True)
 
         assert res.status_code == status.HTTP_200_OK
-        assert res.data == serializer.data
+        assert res.data["results"] == serializer.data
 
     def test_retrive_user_only_tag(self, set_up):
         """Test if user created tags only returned"""
@@ -97,7 +105,7 @@ class ProvateTagApiTests():
         serializer = TagSerializer(tags, many=True)
 
         assert res.status_code == status.HTTP_200_OK
-        assert res.data == serializer.data
+        assert res.data["results"] == serializer.data
 
     def test_update_tag_detail(self, set_up):
         """Test update tag func"""
@@ -112,6 +120,24 @@ class ProvateTagApiTests():
         tag.refresh_from_db()
         assert tag.name == payload["name"]
 
+    def test_update_tag_duplicate_name(self, set_up):
+        """Test renaming to a name the user already has is rejected"""
+        Tag.objects.create(user=self.user, name="Dessert")
+        Tag.objects.create(
+            user=create_user(email="other@mail.com"),
+            name="Soup",
+        )
+        tag = Tag.objects.create(user=self.user, name="dinner")
+
+        res = self.client.patch(detail_url(tag.id), {"name": "Dessert"})
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+        res = self.client.patch(detail_url(tag.id), {"name": "dinner"})
+        assert res.status_code == status.HTTP_200_OK
+
+        res = self.client.patch(detail_url(tag.id), {"name": "Soup"})
+        assert res.status_code == status.HTTP_200_OK
+
     def test_delete_tag(self, set_up):
         """Test delete fucn"""
         tag = Tag.objects.create(user=self.user, name="dinner")
@@ -136,8 +162,8 @@ class ProvateTagApiTests():
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
 
-        assert s1.data in res.data
-        assert s2.data not in res.data
+        assert s1.data in res.data["results"]
+        assert s2.data not in res.data["results"]
 
     def test_filter_tag_unique(self, set_up):
         """Test filtered ing return unique val"""
@@ -152,4 +178,180 @@ class ProvateTagApiTests():
 
         assert res.status_code == status.HTTP_200_OK
 
-        assert len(res.data) == 1
+        assert len(res.data["results"]) == 1
+
+    def test_search_tags(self, set_up):
+        """Test search returns matching tags, most similar first"""
+        Tag.objects.create(user=self.user, name="Tomato")
+        Tag.objects.create(user=self.user, name="Potato")
+        Tag.objects.create(user=self.user, name="Dessert")
+        other_user = create_user(email="other@mail.com")
+        Tag.objects.create(user=other_user, name="Tomato")
+
+        res = self.client.get(TAGS_URL, {"search": "toma"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [t["name"] for t in res.data["results"]] == ["Tomato"]
+        assert res.data["next"] is None
+
+    def test_search_tags_with_typo(self, set_up):
+        """Test search tolerates typos"""
+        if not trigram_installed():
+            pytest.skip("pg_trgm is not installed")
+        Tag.objects.create(user=self.user, name="tomato")
+
+        res = self.client.get(TAGS_URL, {"search": "tomatoe"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [t["name"] for t in res.data["results"]] == ["tomato"]
+
+    def test_autocomplete_tags(self, set_up):
+        """Test autocomplete returns user tags starting with prefix"""
+        Tag.objects.create(user=self.user, name="Tomato")
+        Tag.objects.create(user=self.user, name="tofu")
+        Tag.objects.create(user=self.user, name="Dessert")
+        other_user = create_user(email="other@mail.com")
+        Tag.objects.create(user=other_user, name="Tomatillo")
+
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "TO"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [t["name"] for t in res.data] == ["tofu", "Tomato"]
+
+    def test_autocomplete_cached_until_write(
+        self, set_up, django_assert_num_queries
+    ):
+        """Test autocomplete is served from memory and sees new names"""
+        Tag.objects.create(user=self.user, name="Tomato")
+        self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        with django_assert_num_queries(0):
+            res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+        assert [t["name"] for t in res.data] == ["Tomato"]
+
+        Tag.objects.create(user=self.user, name="Toast")
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        assert [t["name"] for t in res.data] == ["Toast", "Tomato"]
+
+    def test_autocomplete_large_vocabulary(self, set_up, mocker):
+        """Test autocomplete falls back to the database for big vocabularies"""
+        mocker.patch.object(TagViewSet, "trie_max_size", 1)
+        Tag.objects.create(user=self.user, name="Tomato")
+        Tag.objects.create(user=self.user, name="tofu")
+        Tag.objects.create(user=self.user, name="Dessert")
+
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [t["name"] for t in res.data] == ["tofu", "Tomato"]
+
+    def test_autocomplete_cache_bounded_by_nodes(
+        self,
+        set_up,
+        mocker,
+        django_assert_num_queries,
+    ):
+        """Test cached tries are evicted to stay within the node bound"""
+        mocker.patch("recipe.trie.MAX_CACHED_NODES", 10)
+        other_user = create_user(email="other@mail.com")
+        Tag.objects.create(user=self.user, name="Tomato")
+        Tag.objects.create(user=other_user, name="Toast")
+        self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        self.client.force_authenticate(other_user)
+        self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+        with django_assert_num_queries(0):
+            res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+        assert [t["name"] for t in res.data] == ["Toast"]
+
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        assert queries.captured_queries
+        assert [t["name"] for t in res.data] == ["Tomato"]
+
+    def test_autocomplete_same_order_without_trie(self, set_up, mocker):
+        """Test the trie and database fallback order names alike"""
+        for name in ["aZ", "ab", "a_b", "AB", "a b"]:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "a"})
+        mocker.patch.object(TagViewSet, "trie_max_size", 1)
+        fallback = self.client.get(AUTOCOMPLETE_URL, {"prefix": "a"})
+
+        names = [t["name"] for t in res.data]
+        assert names == ["a b", "a_b", "ab", "AB", "aZ"]
+        assert fallback.data == res.data
+
+    def test_tags_not_modified(self, set_up, django_assert_num_queries):
+        """Test unchanged tag list is answered with 304"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        res = self.client.get(TAGS_URL)
+
+        with django_assert_num_queries(0):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_tags_modified_by_recipe_link(self, set_up):
+        """Test assigning a tag to a recipe changes the ETag"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(TAGS_URL, {"assigned_only": 1})["ETag"]
+
+        recipe.tags.add(tag)
+        res = self.client.get(
+            TAGS_URL,
+            {"assigned_only": 1},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data["results"][0]["name"] == "Vegan"
+
+    def test_filter_tag_assigned_with_exists(self, set_up):
+        """Test assigned_only filters with a semi-join, not DISTINCT"""
+        tag = Tag.objects.create(user=self.user, name="Salt")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(res.data["results"]) == 1
+        assert "EXISTS" in queries[0]["sql"]
+        assert "DISTINCT" not in queries[0]["sql"]
+
+    def test_tags_paginated_by_name(self, set_up):
+        """Test tag pages follow the name ordering with a cursor"""
+        for name in ["Apple", "Basil", "Cumin"]:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {"page_size": 2})
+        names = [item["name"] for item in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        names += [item["name"] for item in res.data["results"]]
+
+        assert res.status_code == status.HTTP_200_OK
+        assert names == ["Cumin", "Basil", "Apple"]
+        assert res.data["next"] is None
+
+    def test_merge_duplicate_tags(self, set_up):
+        """Test merging tags of the user differing in case and spacing"""
+        other = create_user(email="other@mail.com")
+        kept = Tag.objects.create(user=self.user, name="Vegan")
+        duplicate = Tag.objects.create(user=self.user, name="vegan ")
+        Tag.objects.create(user=other, name="Vegan")
+        Tag.objects.create(user=other, name="vegan")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(duplicate)
+
+        res = self.client.post(MERGE_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data == {"merged": 1}
+        assert list(recipe.tags.all()) == [kept]
+        assert Tag.objects.filter(user=other).count() == 2
@@ -0,0 +1,46 @@
+"""
+System checks for the database setup of core models
+"""
+from django.core.checks import (
+    Tags,
+    Warning,
+    register,
+)
+from django.db import connections
+
+from core.models import SEARCH_CONFIG
+
+
+SEARCH_FUNCTION = "core_recipe_search_vector_update"
+
+
+@register(Tags.database)
+def check_search_config(app_configs, databases=None, **kwargs):
+    """Warn when the search_vector trigger uses another search config"""
+    errors = []
+    for alias in databases or []:
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            continue
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT prosrc FROM pg_proc WHERE proname = %s",
+                [SEARCH_FUNCTION],
+            )
+            row = cursor.fetchone()
+        if row is None or f"to_tsvector('{SEARCH_CONFIG}'" in row[0]:
+            continue
+
+        errors.append(Warning(
+            f"The search_vector trigger of database {alias!r} does not "
+            f"use SEARCH_CONFIG {SEARCH_CONFIG!r}.",
+            hint=(
+                "Searches would not match the stored vectors. Add a "
+                "migration that recreates the trigger function with the "
+                "new config and fills search_vector again."
+            ),
+            id="core.W001",
+        ))
+
+    return errors
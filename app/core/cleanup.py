@@ -0,0 +1,212 @@
+"""
+Set based maintenance of tags and ingredients
+"""
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import (
+    Exists,
+    OuterRef,
+)
+
+from core.signals import (
+    duplicates_merged,
+    orphans_deleted,
+)
+
+
+def _links(model):
+    """Return recipe link table rows of model objects"""
+    through = model.recipe_set.through
+    return through.objects.filter(**{
+        f"{model._meta.model_name}_id": OuterRef("pk"),
+    })
+
+
+def find_orphans(model, user=None):
+    """Return objects of model linked to no recipe"""
+    queryset = model.objects.filter(~Exists(_links(model)))
+    if user is not None:
+        queryset = queryset.filter(user=user)
+
+    return queryset
+
+
+def orphan_batch(model, batch_size, after=0, user=None):
+    """Return (id, user id) of the next orphans with id above after"""
+    return list(find_orphans(model, user).filter(
+        id__gt=after,
+    ).order_by("id").values_list("id", "user_id")[:batch_size])
+
+
+def delete_orphan_batch(model, batch_size, after=0, user=None):
+    """Delete the next orphans with id above after in one statement
+
+    Returns (id, user id) of deleted rows. Orphans have no links, so
+    this skips the per row collector and delete signals of the ORM and
+    sends orphans_deleted instead.
+    """
+    with transaction.atomic(savepoint=False):
+        # NOT EXISTS cannot see uncommitted links, and their deferred
+        # foreign key checks run only at commit. Writers lock the rows
+        # they are about to link (see recipe.bulk.resolve_names), so
+        # those rows are skipped here instead of failing that check
+        batch = find_orphans(model, user).filter(
+            id__gt=after,
+        ).order_by("id").select_for_update(
+            skip_locked=True,
+        ).values("id")[:batch_size]
+        sql, params = batch.query.sql_with_params()
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id IN ({sql}) "
+                "RETURNING id, user_id",
+                params,
+            )
+            rows = sorted(cursor.fetchall())
+
+    if rows:
+        orphans_deleted.send(
+            sender=model,
+            user_ids={user_id for pk, user_id in rows},
+        )
+
+    return rows
+
+
+# (pattern, suffix, replacement) giving the singular of a plural key,
+# tried in this order
+PLURAL_RULES = [
+    ("ies$", "ies", "y"),
+    ("(ch|sh|s|x|z|o)es$", "es", ""),
+    ("[^s]s$", "s", ""),
+]
+
+
+def _duplicates_sql(model, user=None, fold_plurals=False):
+    """Return SQL and params selecting (dup_id, keep_id) of duplicates
+
+    Names are grouped per user by lower case with runs of whitespace
+    collapsed and trimmed. With fold_plurals a plural joins the group of
+    its singular when the user has that singular too. Each group keeps
+    the row with a clean name, then the most links, then the lowest id.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    links = qn(model.recipe_set.through._meta.db_table)
+    column = qn(f"{model._meta.model_name}_id")
+    where, params = "", []
+    if user is not None:
+        where, params = "WHERE user_id = %s", [user.id]
+
+    joins = ""
+    keys = []
+    if fold_plurals:
+        for index, (pattern, suffix, replacement) in enumerate(
+            PLURAL_RULES
+        ):
+            joins += (
+                f" LEFT JOIN keys p{index}"
+                f" ON p{index}.user_id = k.user_id"
+                f" AND k.key ~ '{pattern}'"
+                f" AND p{index}.key = regexp_replace("
+                f"k.key, '{suffix}$', '{replacement}')"
+            )
+            keys.append(f"p{index}.key")
+    keys.append("k.key")
+
+    return f"""
+        WITH keyed AS (
+            SELECT id, user_id, name,
+                btrim(regexp_replace(lower(name), '\\s+', ' ', 'g')) AS key
+            FROM {table} {where}
+        ),
+        keys AS (
+            SELECT DISTINCT user_id, key FROM keyed
+        ),
+        grouped AS (
+            SELECT k.id, k.user_id, coalesce({", ".join(keys)}) AS key,
+                k.name = btrim(regexp_replace(k.name, '\\s+', ' ', 'g'))
+                    AS clean,
+                -- An index lookup per row, CTE row estimates are too
+                -- rough to plan a join against the whole link table
+                (
+                    SELECT count(*) FROM {links} l
+                    WHERE l.{column} = k.id
+                ) AS links
+            FROM keyed k {joins}
+        ),
+        ranked AS (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY user_id, key
+                ORDER BY clean DESC, links DESC, id
+            ) AS keep_id
+            FROM grouped
+        )
+        SELECT id AS dup_id, keep_id FROM ranked WHERE id <> keep_id
+    """, params
+
+
+def count_duplicates(model, user=None, fold_plurals=False):
+    """Return number of rows merge_duplicates would remove"""
+    sql, params = _duplicates_sql(model, user, fold_plurals)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM ({sql}) duplicates", params)
+        return cursor.fetchone()[0]
+
+
+def merge_duplicates(model, user=None, fold_plurals=False):
+    """Move links of duplicate names to the kept row and delete them
+
+    Returns number of deleted rows, ids of recipes whose links moved
+    and ids of users that had duplicates. Links move without model
+    signals, so duplicates_merged is sent with those ids.
+    """
+    sql, params = _duplicates_sql(model, user, fold_plurals)
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    links = qn(model.recipe_set.through._meta.db_table)
+    column = qn(f"{model._meta.model_name}_id")
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE merge_map ON COMMIT DROP AS {sql}",
+            params,
+        )
+        cursor.execute("ANALYZE merge_map")
+        # A link added to a duplicate after the copy below would block
+        # its delete and then fail the foreign key, so links wait here
+        # and are seen by the statements after the lock
+        cursor.execute(
+            f"SELECT t.id FROM {table} t "
+            "JOIN merge_map m ON m.dup_id = t.id "
+            "ORDER BY t.id FOR UPDATE OF t"
+        )
+        # Recipes linked to several rows of a group keep a single link
+        cursor.execute(
+            f"INSERT INTO {links} (recipe_id, {column}) "
+            f"SELECT DISTINCT l.recipe_id, m.keep_id FROM {links} l "
+            f"JOIN merge_map m ON m.dup_id = l.{column} "
+            "ON CONFLICT DO NOTHING"
+        )
+        cursor.execute(
+            f"DELETE FROM {links} l USING merge_map m "
+            f"WHERE l.{column} = m.dup_id RETURNING l.recipe_id"
+        )
+        recipe_ids = {recipe_id for recipe_id, in cursor.fetchall()}
+        cursor.execute(
+            f"DELETE FROM {table} t USING merge_map m "
+            "WHERE t.id = m.dup_id RETURNING t.user_id"
+        )
+        user_ids = [user_id for user_id, in cursor.fetchall()]
+        cursor.execute("DROP TABLE merge_map")
+
+    if user_ids:
+        duplicates_merged.send(
+            sender=model,
+            recipe_ids=sorted(recipe_ids),
+            user_ids=set(user_ids),
+        )
+
+    return len(user_ids), sorted(recipe_ids), set(user_ids)
@@ -0,0 +1,88 @@
+"""
+Django command to delete tags and ingredients linked to no recipe
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from core.cleanup import (
+    delete_orphan_batch,
+    orphan_batch,
+)
+from core.models import (
+    Tag,
+    Ingredient,
+)
+
+
+class Command(BaseCommand):
+    """Django command to delete orphaned tags and ingredients"""
+    help = "Delete tags and ingredients linked to no recipe in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count orphans without deleting them",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per statement",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches",
+        )
+        parser.add_argument(
+            "--user",
+            help="Only clean up data of the user with this email",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(email=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['user']}")
+
+        for model in [Tag, Ingredient]:
+            self._clean(model, user, options)
+
+    def _clean(self, model, user, options):
+        name = model._meta.verbose_name_plural
+        find = orphan_batch if options["dry_run"] else delete_orphan_batch
+        total = 0
+        after = 0
+        start = time.monotonic()
+        while True:
+            rows = find(model, options["batch_size"], after, user)
+            if not rows:
+                break
+
+            total += len(rows)
+            after = rows[-1][0]
+            if len(rows) < options["batch_size"]:
+                break
+            if not options["dry_run"] and options["sleep"]:
+                time.sleep(options["sleep"])
+
+        elapsed = time.monotonic() - start
+        rate = total / elapsed if elapsed else 0
+        verb = "Found" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {total} orphaned {name} "
+            f"in {elapsed:.2f}s ({rate:.0f} rows/s)"
+        ))
@@ -0,0 +1,71 @@
+"""
+Django command to merge tags and ingredients with duplicate names
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from core.cleanup import (
+    count_duplicates,
+    merge_duplicates,
+)
+from core.models import (
+    Tag,
+    Ingredient,
+)
+
+
+class Command(BaseCommand):
+    """Django command to merge duplicate tags and ingredients"""
+    help = (
+        "Merge tags and ingredients whose names only differ in case, "
+        "whitespace or plural form"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count duplicates without merging them",
+        )
+        parser.add_argument(
+            "--fold-plurals",
+            action="store_true",
+            help="Merge plurals into an existing singular, e.g. tomatoes",
+        )
+        parser.add_argument(
+            "--user",
+            help="Only merge data of the user with this email",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(email=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['user']}")
+
+        for model in [Tag, Ingredient]:
+            name = model._meta.verbose_name_plural
+            start = time.monotonic()
+            if options["dry_run"]:
+                verb = "Found"
+                count = count_duplicates(model, user, options["fold_plurals"])
+            else:
+                verb = "Merged"
+                count, _, _ = merge_duplicates(
+                    model,
+                    user,
+                    options["fold_plurals"],
+                )
+
+            elapsed = time.monotonic() - start
+            self.stdout.write(self.style.SUCCESS(
+                f"{verb} {count} duplicate {name} in {elapsed:.2f}s"
+            ))
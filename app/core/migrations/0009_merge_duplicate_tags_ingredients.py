@@ -0,0 +1,45 @@
+# Generated by Django 4.1.2 on 2026-10-17 07:00
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Merge tags and ingredients sharing a user and name into one row"""
+    Recipe = apps.get_model("core", "Recipe")
+
+    for field_name, column in [("tags", "tag_id"), ("ingredients", "ingredient_id")]:
+        through = getattr(Recipe, field_name).through
+        model = Recipe._meta.get_field(field_name).related_model
+
+        groups = (
+            model.objects.values("user_id", "name")
+            .annotate(canonical=Min("id"), total=Count("id"))
+            .filter(total__gt=1)
+        )
+        for group in groups:
+            canonical = group["canonical"]
+            duplicates = list(model.objects.filter(
+                user_id=group["user_id"],
+                name=group["name"],
+            ).exclude(id=canonical).values_list("id", flat=True))
+
+            for duplicate in duplicates:
+                linked = through.objects.filter(**{column: canonical})
+                through.objects.filter(**{column: duplicate}).exclude(
+                    recipe_id__in=linked.values("recipe_id"),
+                ).update(**{column: canonical})
+                through.objects.filter(**{column: duplicate}).delete()
+
+            model.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,136 @@
+# Generated by Django 4.1.2 on 2026-10-17 07:00
+
+from importlib import import_module
+
+from django.db import migrations, models, transaction
+
+
+RECIPE_INDEX = models.Index(
+    fields=['user', '-id'],
+    name='core_recipe_user_id_idx',
+)
+UNIQUE_CONSTRAINTS = [
+    ('tag', models.UniqueConstraint(
+        fields=('user', 'name'),
+        name='core_tag_user_name_uniq',
+    )),
+    ('ingredient', models.UniqueConstraint(
+        fields=('user', 'name'),
+        name='core_ingredient_user_name_uniq',
+    )),
+]
+
+
+def _index_valid(schema_editor, name):
+    """Return None if index name is missing, else whether it is valid"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT i.indisvalid FROM pg_index i '
+            'JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s',
+            [name],
+        )
+        row = cursor.fetchone()
+
+    return None if row is None else row[0]
+
+
+def _constraint_exists(schema_editor, name):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_constraint WHERE conname = %s',
+            [name],
+        )
+        return cursor.fetchone() is not None
+
+
+def _drop_invalid_index(schema_editor, name):
+    """Drop what a failed concurrent build left behind"""
+    if _index_valid(schema_editor, name) is False:
+        schema_editor.execute(
+            f'DROP INDEX CONCURRENTLY IF EXISTS '
+            f'{schema_editor.quote_name(name)}'
+        )
+
+
+def create_indexes(apps, schema_editor):
+    """Build indexes without locking writes on Postgres
+
+    Every step is skipped when already done, so the migration can be run
+    again after a failed build. Old code may insert duplicate names
+    after 0009 on a live database, so they are merged again right
+    before the unique indexes are built.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.add_index(Recipe, RECIPE_INDEX)
+        for model_name, constraint in UNIQUE_CONSTRAINTS:
+            model = apps.get_model('core', model_name)
+            # add_constraint on SQLite rebuilds the table from the
+            # historical model, which does not have the constraint yet
+            schema_editor.execute(constraint.create_sql(model, schema_editor))
+        return
+
+    _drop_invalid_index(schema_editor, RECIPE_INDEX.name)
+    if _index_valid(schema_editor, RECIPE_INDEX.name) is None:
+        schema_editor.add_index(Recipe, RECIPE_INDEX, concurrently=True)
+
+    merge = import_module(
+        'core.migrations.0009_merge_duplicate_tags_ingredients'
+    )
+    with transaction.atomic():
+        merge.merge_duplicates(apps, schema_editor)
+
+    for model_name, constraint in UNIQUE_CONSTRAINTS:
+        model = apps.get_model('core', model_name)
+        table = schema_editor.quote_name(model._meta.db_table)
+        name = schema_editor.quote_name(constraint.name)
+        if _constraint_exists(schema_editor, constraint.name):
+            continue
+
+        _drop_invalid_index(schema_editor, constraint.name)
+        if _index_valid(schema_editor, constraint.name) is None:
+            schema_editor.execute(
+                f'CREATE UNIQUE INDEX CONCURRENTLY {name} '
+                f'ON {table} (user_id, name)'
+            )
+        schema_editor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+            f'UNIQUE USING INDEX {name}'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    """Drop indexes added by create_indexes"""
+    Recipe = apps.get_model('core', 'Recipe')
+    schema_editor.remove_index(Recipe, RECIPE_INDEX)
+    for model_name, constraint in UNIQUE_CONSTRAINTS:
+        model = apps.get_model('core', model_name)
+        schema_editor.remove_constraint(model, constraint)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_merge_duplicate_tags_ingredients'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=RECIPE_INDEX,
+                ),
+            ] + [
+                migrations.AddConstraint(
+                    model_name=model_name,
+                    constraint=constraint,
+                )
+                for model_name, constraint in UNIQUE_CONSTRAINTS
+            ],
+        ),
+    ]
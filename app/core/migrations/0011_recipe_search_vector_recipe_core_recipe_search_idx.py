@@ -0,0 +1,113 @@
+# Generated by Django 4.1.2 on 2026-10-17 07:03
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from core.models import SEARCH_CONFIG
+
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'],
+    name='core_recipe_search_idx',
+)
+
+BACKFILL_BATCH_SIZE = 1000
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('{config}', coalesce({row}title, '')), 'A') || "
+    "setweight(to_tsvector('{config}', coalesce({row}description, '')), 'B')"
+)
+
+CREATE_TRIGGER_SQL = [
+    """
+    CREATE FUNCTION core_recipe_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {vector};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER core_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON core_recipe
+    FOR EACH ROW EXECUTE FUNCTION core_recipe_search_vector_update()
+    """,
+]
+
+BACKFILL_SQL = (
+    "UPDATE core_recipe SET search_vector = {backfill} "
+    "WHERE id > %s AND id <= %s AND search_vector IS NULL"
+)
+
+DROP_TRIGGER_SQL = [
+    "DROP TRIGGER core_recipe_search_vector_trigger ON core_recipe",
+    "DROP FUNCTION core_recipe_search_vector_update()",
+]
+
+
+def create_search_trigger(apps, schema_editor):
+    """Keep search_vector in sync with title and description on Postgres"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for sql in CREATE_TRIGGER_SQL:
+        schema_editor.execute(sql.format(
+            vector=SEARCH_VECTOR_SQL.format(config=SEARCH_CONFIG, row='NEW.'),
+        ))
+
+    # Rows written from here on are filled by the trigger. Existing rows
+    # are filled in id ranges, each committed on its own, so no write
+    # waits on a lock for longer than one batch
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT coalesce(max(id), 0) FROM core_recipe')
+        last_id = cursor.fetchone()[0]
+    backfill = BACKFILL_SQL.format(
+        backfill=SEARCH_VECTOR_SQL.format(config=SEARCH_CONFIG, row=''),
+    )
+    for start in range(0, last_id, BACKFILL_BATCH_SIZE):
+        schema_editor.execute(backfill, [start, start + BACKFILL_BATCH_SIZE])
+
+    Recipe = apps.get_model('core', 'Recipe')
+    schema_editor.add_index(Recipe, SEARCH_INDEX, concurrently=True)
+
+
+def drop_search_trigger(apps, schema_editor):
+    """Drop trigger and index added by create_search_trigger"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Recipe = apps.get_model('core', 'Recipe')
+    schema_editor.remove_index(Recipe, SEARCH_INDEX)
+    for sql in DROP_TRIGGER_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_recipe_core_recipe_user_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    create_search_trigger,
+                    drop_search_trigger,
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=SEARCH_INDEX,
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.1.2 on 2026-10-17 07:17
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+TRIGRAM_INDEXES = [
+    ('ingredient', django.contrib.postgres.indexes.GinIndex(
+        fields=['name'],
+        name='core_ingredient_name_trgm_idx',
+        opclasses=['gin_trgm_ops'],
+    )),
+    ('tag', django.contrib.postgres.indexes.GinIndex(
+        fields=['name'],
+        name='core_tag_name_trgm_idx',
+        opclasses=['gin_trgm_ops'],
+    )),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Install pg_trgm and build name indexes if the server ships it"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for model_name, index in TRIGRAM_INDEXES:
+        model = apps.get_model('core', model_name)
+        schema_editor.add_index(model, index, concurrently=True)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    """Drop indexes added by create_trigram_indexes"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for model_name, index in TRIGRAM_INDEXES:
+        name = schema_editor.quote_name(index.name)
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_recipe_search_vector_recipe_core_recipe_search_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    create_trigram_indexes,
+                    drop_trigram_indexes,
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index)
+                for model_name, index in TRIGRAM_INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.1.2 on 2026-10-17 07:20
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+PREFIX_INDEXES = [
+    ('ingredient', models.Index(
+        models.F('user'),
+        django.contrib.postgres.indexes.OpClass(
+            django.db.models.functions.text.Upper('name'),
+            name='varchar_pattern_ops',
+        ),
+        name='core_ingredient_prefix_idx',
+    )),
+    ('tag', models.Index(
+        models.F('user'),
+        django.contrib.postgres.indexes.OpClass(
+            django.db.models.functions.text.Upper('name'),
+            name='varchar_pattern_ops',
+        ),
+        name='core_tag_prefix_idx',
+    )),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """Build prefix lookup indexes without locking writes on Postgres"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for model_name, index in PREFIX_INDEXES:
+        model = apps.get_model('core', model_name)
+        schema_editor.add_index(model, index, concurrently=True)
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    """Drop indexes added by create_prefix_indexes"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for model_name, index in PREFIX_INDEXES:
+        model = apps.get_model('core', model_name)
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_ingredient_core_ingredient_name_trgm_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    create_prefix_indexes,
+                    drop_prefix_indexes,
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index)
+                for model_name, index in PREFIX_INDEXES
+            ],
+        ),
+    ]
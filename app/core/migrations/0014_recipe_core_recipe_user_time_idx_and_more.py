@@ -0,0 +1,55 @@
+# Generated by Django 4.1.2 on 2026-10-17 07:30
+
+from django.db import migrations, models
+
+
+RANGE_INDEXES = [
+    models.Index(
+        fields=['user', 'time_minutes'],
+        name='core_recipe_user_time_idx',
+    ),
+    models.Index(
+        fields=['user', 'price'],
+        name='core_recipe_user_price_idx',
+    ),
+]
+
+
+def create_range_indexes(apps, schema_editor):
+    """Build indexes without locking writes on Postgres"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for index in RANGE_INDEXES:
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.add_index(Recipe, index, concurrently=True)
+        else:
+            schema_editor.add_index(Recipe, index)
+
+
+def drop_range_indexes(apps, schema_editor):
+    """Drop indexes added by create_range_indexes"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for index in RANGE_INDEXES:
+        schema_editor.remove_index(Recipe, index)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_ingredient_core_ingredient_prefix_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    create_range_indexes,
+                    drop_range_indexes,
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name='recipe', index=index)
+                for index in RANGE_INDEXES
+            ],
+        ),
+    ]
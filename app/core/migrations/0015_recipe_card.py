@@ -0,0 +1,18 @@
+# Generated by Django 4.1.2 on 2026-10-17 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_core_recipe_user_time_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='card',
+            field=models.TextField(editable=False, null=True),
+        ),
+    ]
@@ -2,7 +2,13 @@
 Database models
 """
 from django.conf import settings
+from django.contrib.postgres.indexes import (
+    GinIndex,
+    OpClass,
+)
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -21,6 +27,11 @@ def recipe_image_file_path(instance, filename):
     return os.path.join("uploads", "recipe", filename)
 
 
+# Text search configuration used by the search_vector trigger and queries.
+# The trigger keeps the config it was created with, check core.W001
+SEARCH_CONFIG = "english"
+
+
 # Create your models here.
 
 
@@ -68,6 +79,26 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"],
+                name="core_tag_user_name_uniq",
+            ),
+        ]
+        indexes = [
+            GinIndex(
+                fields=["name"],
+                name="core_tag_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            models.Index(
+                "user",
+                OpClass(Upper("name"), name="varchar_pattern_ops"),
+                name="core_tag_prefix_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -80,6 +111,26 @@ class Ingredient(models.Model):
     )
     name = models.CharField(max_length=200)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"],
+                name="core_ingredient_user_name_uniq",
+            ),
+        ]
+        indexes = [
+            GinIndex(
+                fields=["name"],
+                name="core_ingredient_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            models.Index(
+                "user",
+                OpClass(Upper("name"), name="varchar_pattern_ops"),
+                name="core_ingredient_prefix_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -98,6 +149,29 @@ class Recipe(models.Model):
     tags = models.ManyToManyField("Tag")
     ingredients = models.ManyToManyField("Ingredient")
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Rendered list representation, kept current by recipe.signals
+    card = models.TextField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-id"],
+                name="core_recipe_user_id_idx",
+            ),
+            models.Index(
+                fields=["user", "time_minutes"],
+                name="core_recipe_user_time_idx",
+            ),
+            models.Index(
+                fields=["user", "price"],
+                name="core_recipe_user_price_idx",
+            ),
+            GinIndex(
+                fields=["search_vector"],
+                name="core_recipe_search_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,12 @@
+"""
+Signals sent by set based maintenance of tags and ingredients
+"""
+from django.dispatch import Signal
+
+
+# Sent with user_ids after orphans of the sender model were deleted
+orphans_deleted = Signal()
+
+# Sent with recipe_ids and user_ids after duplicates of the sender model
+# were merged
+duplicates_merged = Signal()
@@ -0,0 +1,24 @@
+"""
+Test system checks of the database setup
+"""
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from core.checks import check_search_config
+
+
+class SearchConfigCheckTests(TestCase):
+    """Test search_vector trigger config check"""
+    databases = {"default"}
+
+    def test_trigger_matches_config(self):
+        """Test the migrated trigger uses SEARCH_CONFIG"""
+        self.assertEqual(check_search_config(None, databases=["default"]), [])
+
+    @patch("core.checks.SEARCH_CONFIG", "simple")
+    def test_changed_config_warns(self):
+        """Test a config differing from the trigger is reported"""
+        errors = check_search_config(None, databases=["default"])
+
+        self.assertEqual([error.id for error in errors], ["core.W001"])
@@ -1,13 +1,41 @@
 """
 Test Wait for DB
 """
-from unittest.mock import patch
+from decimal import Decimal
+from io import StringIO
+import json
+from threading import Thread
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
 
 from psycopg2 import OperationalError as Psycog2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import (
+    connection,
+    connections,
+    transaction,
+)
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+)
+from django.test.utils import CaptureQueriesContext
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from core.signals import orphans_deleted
+from recipe.bulk import resolve_names
+from recipe.caching import get_data_version
 
 
 @patch("core.management.commands.wait_for_db.Command.check")
@@ -30,3 +58,273 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=["default"])
+
+
+class DeleteOrphansCommandTests(TestCase):
+    """Test delete_orphans command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@mail.com",
+            password="password",
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title="Curry",
+            time_minutes=30,
+            price=Decimal("5.00"),
+        )
+
+    def _call(self, *args):
+        out = StringIO()
+        call_command("delete_orphans", *args, stdout=out)
+        return out.getvalue()
+
+    def test_delete_orphans(self):
+        """Test only tags and ingredients without recipes are deleted"""
+        linked = Tag.objects.create(user=self.user, name="Dinner")
+        self.recipe.tags.add(linked)
+        Tag.objects.create(user=self.user, name="Unused")
+        Ingredient.objects.create(user=self.user, name="Salt")
+
+        out = self._call()
+
+        self.assertEqual(list(Tag.objects.all()), [linked])
+        self.assertFalse(Ingredient.objects.exists())
+        self.assertIn("Deleted 1 orphaned tags", out)
+        self.assertIn("Deleted 1 orphaned ingredients", out)
+
+    def test_dry_run_keeps_orphans(self):
+        """Test dry run only counts orphans"""
+        Tag.objects.create(user=self.user, name="Unused")
+
+        out = self._call("--dry-run")
+
+        self.assertEqual(Tag.objects.count(), 1)
+        self.assertIn("Found 1 orphaned tags", out)
+
+    def test_user_scope(self):
+        """Test --user leaves orphans of other users alone"""
+        other = get_user_model().objects.create_user(
+            email="other@mail.com",
+            password="password",
+        )
+        Tag.objects.create(user=self.user, name="Unused")
+        kept = Tag.objects.create(user=other, name="Unused")
+
+        self._call("--user", "test@mail.com")
+
+        self.assertEqual(list(Tag.objects.all()), [kept])
+
+    def test_unknown_user(self):
+        """Test --user with unknown email fails"""
+        with self.assertRaises(CommandError):
+            self._call("--user", "nobody@mail.com")
+
+    @patch("time.sleep")
+    def test_delete_in_batches(self, patched_sleep):
+        """Test orphans are deleted in batches with a pause after each"""
+        Tag.objects.bulk_create(
+            Tag(user=self.user, name=f"tag {i}") for i in range(5)
+        )
+
+        # Three tag batches and one empty ingredient batch
+        with self.assertNumQueries(4):
+            self._call("--batch-size", "2", "--sleep", "0.5")
+
+        self.assertFalse(Tag.objects.exists())
+        # No pause after the last, short batch
+        self.assertEqual(patched_sleep.call_count, 2)
+        patched_sleep.assert_called_with(0.5)
+
+    def test_delete_sends_orphans_deleted(self):
+        """Test deleted batches are announced with their users"""
+        handler = MagicMock()
+        orphans_deleted.connect(handler)
+        self.addCleanup(orphans_deleted.disconnect, handler)
+        Tag.objects.create(user=self.user, name="Unused")
+
+        self._call()
+
+        handler.assert_called_once()
+        self.assertIs(handler.call_args.kwargs["sender"], Tag)
+        self.assertEqual(handler.call_args.kwargs["user_ids"], {self.user.id})
+
+    def test_delete_bumps_data_version(self):
+        """Test cached tag lists are invalidated"""
+        Tag.objects.create(user=self.user, name="Unused")
+        version = get_data_version(self.user.id)
+
+        self._call()
+
+        self.assertNotEqual(get_data_version(self.user.id), version)
+
+
+class DeleteOrphansConcurrencyTests(TransactionTestCase):
+    """Test delete_orphans next to writers linking the same rows"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@mail.com",
+            password="password",
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title="Curry",
+            time_minutes=30,
+            price=Decimal("5.00"),
+        )
+
+    def _call_in_thread(self):
+        """Run the command on a database connection of its own"""
+        out = StringIO()
+
+        def run():
+            try:
+                call_command("delete_orphans", stdout=out)
+            finally:
+                connections.close_all()
+
+        thread = Thread(target=run)
+        thread.start()
+        thread.join()
+        return out.getvalue()
+
+    def test_orphan_being_linked_is_kept(self):
+        """Test an orphan resolved by a writer survives until it is linked"""
+        Tag.objects.create(user=self.user, name="Dinner")
+
+        with transaction.atomic():
+            tag = resolve_names(Tag, self.user, ["Dinner"])["Dinner"]
+            out = self._call_in_thread()
+            self.recipe.tags.add(tag)
+
+        self.assertIn("Deleted 0 orphaned tags", out)
+        self.assertEqual(list(self.recipe.tags.all()), [tag])
+
+
+class MergeDuplicatesCommandTests(TestCase):
+    """Test merge_duplicates command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@mail.com",
+            password="password",
+        )
+
+    def _recipe(self, *ingredients):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title="Curry",
+            time_minutes=30,
+            price=Decimal("5.00"),
+        )
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def _call(self, *args):
+        out = StringIO()
+        call_command("merge_duplicates", *args, stdout=out)
+        return out.getvalue()
+
+    def test_merge_case_and_whitespace(self):
+        """Test names differing in case and spacing are merged"""
+        kept = Ingredient.objects.create(user=self.user, name="Tomato")
+        spaced = Ingredient.objects.create(user=self.user, name="tomato ")
+        upper = Ingredient.objects.create(user=self.user, name="TOMATO")
+        onion = Ingredient.objects.create(user=self.user, name="Onion")
+        r1 = self._recipe(spaced, onion)
+        r2 = self._recipe(kept, upper)
+
+        out = self._call()
+
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list("name", flat=True)),
+            ["Onion", "Tomato"],
+        )
+        self.assertEqual(set(r1.ingredients.all()), {kept, onion})
+        self.assertEqual(list(r2.ingredients.all()), [kept])
+        self.assertIn("Merged 2 duplicate ingredients", out)
+
+    def test_merge_locks_duplicates_first(self):
+        """Test duplicates are locked before their links are moved"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        Tag.objects.create(user=self.user, name="vegan")
+
+        with CaptureQueriesContext(connection) as queries:
+            self._call()
+
+        sql = [query["sql"] for query in queries]
+        lock = next(i for i, q in enumerate(sql) if "FOR UPDATE" in q)
+        move = next(i for i, q in enumerate(sql) if q.startswith("INSERT"))
+        self.assertLess(lock, move)
+
+    def test_kept_row_has_clean_name(self):
+        """Test a name without stray whitespace wins over more links"""
+        spaced = Ingredient.objects.create(user=self.user, name=" salt")
+        kept = Ingredient.objects.create(user=self.user, name="Salt")
+        self._recipe(spaced)
+        self._recipe(spaced)
+
+        self._call()
+
+        self.assertEqual(list(Ingredient.objects.all()), [kept])
+        self.assertEqual(kept.recipe_set.count(), 2)
+
+    def test_fold_plurals(self):
+        """Test plurals join an existing singular only when asked"""
+        for name in ["tomato", "Tomatoes", "berry", "berries", "glass"]:
+            Ingredient.objects.create(user=self.user, name=name)
+
+        self._call()
+        self.assertEqual(Ingredient.objects.count(), 5)
+
+        self._call("--fold-plurals")
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list("name", flat=True)),
+            ["berry", "glass", "tomato"],
+        )
+
+    def test_dry_run_keeps_duplicates(self):
+        """Test dry run only counts duplicates"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        Tag.objects.create(user=self.user, name="vegan")
+
+        out = self._call("--dry-run")
+
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertIn("Found 1 duplicate tags", out)
+
+    def test_users_not_merged(self):
+        """Test equal names of different users stay separate"""
+        other = get_user_model().objects.create_user(
+            email="other@mail.com",
+            password="password",
+        )
+        Tag.objects.create(user=self.user, name="Vegan")
+        Tag.objects.create(user=self.user, name="vegan")
+        Tag.objects.create(user=other, name="Vegan")
+        Tag.objects.create(user=other, name="vegan")
+
+        self._call("--user", "test@mail.com")
+
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Tag.objects.filter(user=other).count(), 2)
+
+    def test_merge_refreshes_cards(self):
+        """Test recipe cards show the kept row after a merge"""
+        kept = Ingredient.objects.create(user=self.user, name="Salt")
+        self._recipe(kept)
+        recipe = self._recipe(
+            Ingredient.objects.create(user=self.user, name="salt"),
+        )
+        version = get_data_version(self.user.id)
+
+        self._call()
+
+        recipe.refresh_from_db()
+        self.assertEqual(
+            json.loads(recipe.card)["ingredients"],
+            [{"id": kept.id, "name": "Salt"}],
+        )
+        self.assertNotEqual(get_data_version(self.user.id), version)
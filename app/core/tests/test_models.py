@@ -5,6 +5,7 @@ from decimal import Decimal
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 
 from core import models
 
@@ -85,6 +86,26 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingrdient), ingrdient_name)
 
+    def test_tag_name_unique_per_user(self):
+        """Test a user cannot hold two tags with the same name"""
+        user = create_user()
+        other_user = create_user(email="other@mail.com")
+        models.Tag.objects.create(user=user, name="Tag1")
+        models.Tag.objects.create(user=other_user, name="Tag1")
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name="Tag1")
+
+    def test_ingredient_name_unique_per_user(self):
+        """Test a user cannot hold two ingredients with the same name"""
+        user = create_user()
+        other_user = create_user(email="other@mail.com")
+        models.Ingredient.objects.create(user=user, name="Salt")
+        models.Ingredient.objects.create(user=other_user, name="Salt")
+
+        with self.assertRaises(IntegrityError):
+            models.Ingredient.objects.create(user=user, name="Salt")
+
     @patch("core.models.uuid.uuid4")
     def test_recipe_file_name_uuild(self, mock_uuid):
         """Test generate image path"""
@@ -0,0 +1,173 @@
+"""
+Batched writes for recipe APIs
+"""
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.caching import bump_data_version
+from recipe.cards import schedule_card_refresh
+
+
+def _lock_rows(queryset):
+    """Lock rows until commit so orphan cleanup and merges leave them"""
+    # Links check their foreign key only at commit, so without this a
+    # cleanup could delete a row that is about to be linked
+    return queryset.order_by("id").select_for_update(no_key=True)
+
+
+def resolve_names(model, user, names, identity_map=None):
+    """Return name to object map for names of user, creating missing ones
+
+    Returned rows are locked until the end of the current transaction.
+    """
+    # Dedupe in input order, so new rows get ids in request order
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+
+    known = {}
+    if identity_map is not None:
+        known = identity_map.get_objects(model, user, names)
+        if known:
+            # Rows found by an earlier transaction of the request are
+            # locked again, and resolved again if they were deleted since
+            locked = set(_lock_rows(model.objects.filter(
+                id__in=[obj.id for obj in known.values()],
+            )).values_list("id", flat=True))
+            known = {
+                name: obj
+                for name, obj in known.items()
+                if obj.id in locked
+            }
+        names = [name for name in names if name not in known]
+        if not names:
+            return known
+
+    objects = {
+        obj.name: obj
+        for obj in _lock_rows(model.objects.filter(user=user, name__in=names))
+    }
+    missing = [name for name in names if name not in objects]
+    if missing:
+        # Concurrent writers may create the same names, so re-select
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        objects.update(
+            (obj.name, obj)
+            for obj in _lock_rows(
+                model.objects.filter(user=user, name__in=missing),
+            )
+        )
+    if identity_map is not None:
+        identity_map.add_objects(model, user, objects)
+
+    return {**known, **objects}
+
+
+def _link_pairs(recipes, rows, field, objects):
+    """Return unique (recipe id, related id) pairs requested by rows"""
+    return {
+        (recipe.id, objects[item["name"]].id)
+        for recipe, row in zip(recipes, rows)
+        for item in row.get(field, [])
+    }
+
+
+def _link_rows(through, related_id, pairs):
+    """Build through rows for (recipe id, related id) pairs"""
+    return [
+        through(recipe_id=recipe_id, **{related_id: pk})
+        for recipe_id, pk in pairs
+    ]
+
+
+def create_recipes(user, rows, identity_map=None):
+    """Insert validated recipe rows with their tags and ingredients"""
+    tags = resolve_names(Tag, user, (
+        tag["name"] for row in rows for tag in row.get("tags", [])
+    ), identity_map)
+    ingredients = resolve_names(Ingredient, user, (
+        ingredient["name"]
+        for row in rows
+        for ingredient in row.get("ingredients", [])
+    ), identity_map)
+    recipes = Recipe.objects.bulk_create([
+        Recipe(user=user, **{
+            key: value
+            for key, value in row.items()
+            if key not in ("tags", "ingredients")
+        })
+        for row in rows
+    ])
+    for field, related_id, objects in [
+        ("tags", "tag_id", tags),
+        ("ingredients", "ingredient_id", ingredients),
+    ]:
+        through = getattr(Recipe, field).through
+        through.objects.bulk_create(_link_rows(
+            through,
+            related_id,
+            _link_pairs(recipes, rows, field, objects),
+        ))
+
+    # bulk_create sends no model signals
+    schedule_card_refresh((recipe.id for recipe in recipes), created=True)
+    bump_data_version(user.id)
+
+    return recipes
+
+
+def update_recipes(user, recipes, rows, identity_map=None):
+    """Apply validated partial rows to recipes of user"""
+    fields = {
+        key
+        for row in rows
+        for key in row
+        if key not in ("tags", "ingredients")
+    }
+    for recipe, row in zip(recipes, rows):
+        for key in fields & row.keys():
+            setattr(recipe, key, row[key])
+    if fields:
+        Recipe.objects.bulk_update(recipes, sorted(fields))
+
+    for field, related_id, model in [
+        ("tags", "tag_id", Tag),
+        ("ingredients", "ingredient_id", Ingredient),
+    ]:
+        changed = [
+            (recipe, row)
+            for recipe, row in zip(recipes, rows)
+            if field in row
+        ]
+        if not changed:
+            continue
+
+        objects = resolve_names(model, user, (
+            item["name"] for recipe, row in changed for item in row[field]
+        ), identity_map)
+        wanted = _link_pairs(*zip(*changed), field, objects)
+        through = getattr(Recipe, field).through
+        current = {
+            (recipe_id, pk): link_id
+            for link_id, recipe_id, pk in through.objects.filter(
+                recipe_id__in=[recipe.id for recipe, row in changed],
+            ).values_list("id", "recipe_id", related_id)
+        }
+        # Only touch links that changed, like RecipeSerializer.update
+        stale = [current[pair] for pair in current.keys() - wanted]
+        if stale:
+            through.objects.filter(id__in=stale).delete()
+        through.objects.bulk_create(_link_rows(
+            through,
+            related_id,
+            wanted - current.keys(),
+        ))
+
+    # bulk_update and through table writes send no model signals
+    schedule_card_refresh(recipe.id for recipe in recipes)
+    bump_data_version(user.id)
@@ -0,0 +1,182 @@
+"""
+Stored list representations of recipes
+"""
+from contextlib import contextmanager
+import json
+from threading import local
+
+from django.db import transaction
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core.models import Recipe
+from recipe.caching import bump_data_version
+
+
+CARD_COLUMNS = ["id", "title", "time_minutes", "price", "link"]
+REFRESH_BATCH_SIZE = 500
+
+_local = local()
+
+# Formats prices exactly like the ModelSerializer field of RecipeSerializer
+_price_field = serializers.DecimalField(
+    max_digits=Recipe._meta.get_field("price").max_digits,
+    decimal_places=Recipe._meta.get_field("price").decimal_places,
+)
+
+
+def recipe_representations(rows):
+    """Build RecipeSerializer output for value rows in bulk"""
+    ids = [row["id"] for row in rows]
+    related = {}
+    for name, related_name in [
+        ("tags", "tag"),
+        ("ingredients", "ingredient"),
+    ]:
+        related[name] = {pk: [] for pk in ids}
+        through = getattr(Recipe, name).through
+        links = through.objects.filter(recipe_id__in=ids).order_by(
+            f"{related_name}_id",
+        ).values_list(
+            "recipe_id",
+            f"{related_name}_id",
+            f"{related_name}__name",
+        )
+        for recipe_id, pk, related_value in links:
+            related[name][recipe_id].append(
+                {"id": pk, "name": related_value}
+            )
+
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "time_minutes": row["time_minutes"],
+            "price": _price_field.to_representation(row["price"]),
+            "link": row["link"],
+            "tags": related["tags"][row["id"]],
+            "ingredients": related["ingredients"][row["id"]],
+        }
+        for row in rows
+    ]
+
+
+def render_cards(rows):
+    """Return JSON card text for value rows"""
+    renderer = JSONRenderer()
+    return [
+        renderer.render(data).decode()
+        for data in recipe_representations(rows)
+    ]
+
+
+def store_cards(ids, cards):
+    """Save cards rendered on read without sending model signals
+
+    Only cards that are still missing are filled in, so a card rendered
+    from rows read before a write never replaces the one of the writer.
+    """
+    Recipe.objects.filter(card__isnull=True).bulk_update(
+        [Recipe(id=pk, card=card) for pk, card in zip(ids, cards)],
+        ["card"],
+    )
+
+
+def refresh_cards(recipe_ids):
+    """Regenerate cards of recipes in batches"""
+    ids = sorted(set(recipe_ids))
+    user_ids = set()
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        # Writers clear the card under this row lock, so a card rendered
+        # here is never stored over a later write
+        with transaction.atomic(savepoint=False):
+            rows = list(Recipe.objects.filter(
+                id__in=ids[start:start + REFRESH_BATCH_SIZE],
+            ).order_by("id").select_for_update().values(
+                *CARD_COLUMNS,
+                "user_id",
+            ))
+            Recipe.objects.bulk_update(
+                [
+                    Recipe(id=row["id"], card=card)
+                    for row, card in zip(rows, render_cards(rows))
+                ],
+                ["card"],
+            )
+        user_ids.update(row["user_id"] for row in rows)
+
+    # Lists read between the write and this refresh may have been
+    # cached with old cards under the current version
+    for user_id in user_ids:
+        bump_data_version(user_id)
+
+
+def schedule_card_refresh(recipe_ids, created=False):
+    """Refresh cards now, or when the deferred_card_refresh block ends
+
+    Deferred cards are cleared right away, in the transaction of the
+    write, so reads in between render them from the new rows. Created
+    recipes have no card yet.
+    """
+    pending = getattr(_local, "pending", None)
+    if pending is None:
+        refresh_cards(recipe_ids)
+        return
+
+    recipe_ids = set(recipe_ids) - pending
+    if recipe_ids and not created:
+        Recipe.objects.filter(id__in=recipe_ids).update(card=None)
+    pending.update(recipe_ids)
+
+
+@contextmanager
+def deferred_card_refresh():
+    """Coalesce card refreshes of a request into one batch"""
+    if getattr(_local, "pending", None) is not None:
+        yield
+        return
+
+    _local.pending = set()
+    try:
+        yield
+    finally:
+        pending, _local.pending = _local.pending, None
+        # Cards are rebuilt from the database, so this is also right
+        # after a rolled back write
+        if pending:
+            refresh_cards(pending)
+
+
+class CardListResponse(Response):
+    """Paginated response with stored cards as results"""
+
+    def __init__(self, envelope, cards, **kwargs):
+        self.cards = cards
+        super().__init__(envelope, **kwargs)
+
+    @property
+    def data(self):
+        if self._data["results"] is None:
+            self._data["results"] = [json.loads(card) for card in self.cards]
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    @property
+    def rendered_content(self):
+        if self.accepted_media_type != JSONRenderer.media_type:
+            return super().rendered_content
+
+        self["Content-Type"] = JSONRenderer.media_type
+        envelope = JSONRenderer().render({**self._data, "results": []})
+        # results is the last key of the envelope, splice the cards in
+        return b"".join([
+            envelope[:-len(b"[]}")],
+            b"[",
+            ",".join(self.cards).encode(),
+            b"]}",
+        ])
@@ -0,0 +1,31 @@
+"""
+System checks for recipe API settings
+"""
+from django.conf import settings
+from django.core.checks import (
+    Tags,
+    Warning,
+    register,
+)
+
+
+LOCAL_CACHE_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+
+
+@register(Tags.caches)
+def check_recipe_cache_shared(app_configs, **kwargs):
+    """Warn when other processes cannot invalidate the recipe cache"""
+    backend = settings.CACHES.get(settings.RECIPE_CACHE, {}).get("BACKEND")
+    if backend != LOCAL_CACHE_BACKEND:
+        return []
+
+    return [Warning(
+        "RECIPE_CACHE uses LocMemCache, which is private to each process.",
+        hint=(
+            "Data versions bumped by management commands or other "
+            "workers never reach it, so cached recipe responses go stale. "
+            "Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such "
+            "as Memcached, Redis or the database cache."
+        ),
+        id="recipe.W001",
+    )]
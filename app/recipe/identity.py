@@ -0,0 +1,60 @@
+"""
+Request scoped identity map for tags and ingredients
+"""
+
+
+class IdentityMap:
+    """Tags and ingredients loaded or rendered during one request"""
+
+    def __init__(self):
+        self.objects = {}
+        self.representations = {}
+
+    def get_objects(self, model, user, names):
+        """Return name to object map of the names already loaded"""
+        return {
+            name: self.objects[(model, user.id, name)]
+            for name in names
+            if (model, user.id, name) in self.objects
+        }
+
+    def add_objects(self, model, user, objects):
+        """Remember name to object map of loaded objects"""
+        self.objects.update(
+            ((model, user.id, name), obj) for name, obj in objects.items()
+        )
+
+    def representation(self, serializer, instance, render):
+        """Return rendered instance, calling render once per object"""
+        key = (type(serializer), instance.pk)
+        if key not in self.representations:
+            self.representations[key] = render(instance)
+
+        return self.representations[key]
+
+
+def get_identity_map(request):
+    """Return identity map of request, creating it on first use"""
+    if request is None:
+        return None
+
+    identity_map = getattr(request, "_identity_map", None)
+    if identity_map is None:
+        identity_map = request._identity_map = IdentityMap()
+
+    return identity_map
+
+
+class IdentityMapMixin:
+    """Render each object once per request in nested serializers"""
+
+    def to_representation(self, instance):
+        identity_map = get_identity_map(self.context.get("request"))
+        if identity_map is None:
+            return super().to_representation(instance)
+
+        return identity_map.representation(
+            self,
+            instance,
+            super().to_representation,
+        )
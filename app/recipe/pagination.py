@@ -0,0 +1,27 @@
+"""
+Pagination for recipe APIs
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over newest recipes first"""
+    ordering = "-id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        """Keep the ordering chosen by the view, e.g. search rank"""
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+
+        return super().get_ordering(request, queryset, view)
+
+
+class NameCursorPagination(CursorPagination):
+    """Keyset pagination over tag or ingredient names"""
+    ordering = ("-name", "-id")
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
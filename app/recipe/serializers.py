@@ -2,6 +2,8 @@
 Serializers for recipe API
 """
 
+from django.db import transaction
+
 from rest_framework import serializers
 
 from core.models import (
@@ -9,9 +11,53 @@ from core.models import (
     Tag,
     Ingredient,
 )
+from recipe.bulk import resolve_names
+from recipe.identity import (
+    IdentityMapMixin,
+    get_identity_map,
+)
+
+
+class DynamicFieldsMixin:
+    """Limit serializer output to the fields passed in"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
 
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class UserUniqueNameMixin:
+    """Reject renaming to a name the user already has"""
+
+    def validate_name(self, value):
+        # Nested in a recipe, an existing name links the existing object
+        if self.parent is not None:
+            return value
+
+        queryset = self.Meta.model.objects.filter(
+            user=self.context["request"].user,
+            name=value,
+        )
+        if self.instance is not None:
+            queryset = queryset.exclude(id=self.instance.id)
+        if queryset.exists():
+            raise serializers.ValidationError(
+                f"{self.Meta.model._meta.verbose_name.capitalize()} "
+                "with this name already exists."
+            )
 
-class TagSerializer(serializers.ModelSerializer):
+        return value
+
+
+class TagSerializer(
+    UserUniqueNameMixin,
+    IdentityMapMixin,
+    serializers.ModelSerializer,
+):
     """Tags Model Serializer"""
     class Meta:
         model = Tag
@@ -22,7 +68,11 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    UserUniqueNameMixin,
+    IdentityMapMixin,
+    serializers.ModelSerializer,
+):
     """Ingredient Model Serializers"""
     class Meta:
         model = Ingredient
@@ -33,7 +83,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """ Recipe Model Serializer"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -51,55 +101,75 @@ class RecipeSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id"]
 
-    def _get_or_create_tags(self, tags, recipe):
-        """Handle getting or create tag"""
-        auth_user = self.context["request"].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag
-            )
-            recipe.tags.add(tag_obj)
-
-    def _get_or_create_ingredients(self, ingredients, recipe):
-        """Handle getting or create tag"""
-        auth_user = self.context["request"].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient
-            )
-            recipe.ingredients.add(ingredient_obj)
+    def _get_or_create_tags(self, tags):
+        """Handle getting or create tags"""
+        request = self.context["request"]
+        tag_objs = resolve_names(
+            Tag,
+            request.user,
+            (tag["name"] for tag in tags),
+            get_identity_map(request),
+        )
+        return tag_objs.values()
+
+    def _get_or_create_ingredients(self, ingredients):
+        """Handle getting or create ingredients"""
+        request = self.context["request"]
+        ingredient_objs = resolve_names(
+            Ingredient,
+            request.user,
+            (ingredient["name"] for ingredient in ingredients),
+            get_identity_map(request),
+        )
+        return ingredient_objs.values()
 
     def create(self, validated_data):
         """Create Recipe with Tag"""
         tags = validated_data.pop("tags", [])
         ingredients = validated_data.pop("ingredients", [])
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            recipe.tags.add(*self._get_or_create_tags(tags))
+            recipe.ingredients.add(
+                *self._get_or_create_ingredients(ingredients)
+            )
 
         return recipe
 
     def update(self, instance, validated_data):
         """Udpate recipe with tag"""
         tags = validated_data.pop("tags", None)
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
-
         ingredients = validated_data.pop("ingredients", None)
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
-
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        instance.save()
+        if tags is None and ingredients is None:
+            instance.save()
+            return instance
+
+        with transaction.atomic():
+            # set() only deletes and inserts the changed links
+            if tags is not None:
+                instance.tags.set(self._get_or_create_tags(tags))
+
+            if ingredients is not None:
+                instance.ingredients.set(
+                    self._get_or_create_ingredients(ingredients)
+                )
+
+            instance.save()
+
         return instance
 
 
+class RecipeSearchSerializer(RecipeSerializer):
+    """Recipe Serializer with highlighted search snippet"""
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ["snippet"]
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Recipe Detail Serialize"""
 
@@ -107,6 +177,44 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ["description", "image"]
 
 
+class FacetSerializer(serializers.Serializer):
+    """Tag or Ingredient with number of matching recipes"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class RecipeFacetsSerializer(serializers.Serializer):
+    """Recipe counts per tag and ingredient"""
+    tags = FacetSerializer(many=True)
+    ingredients = FacetSerializer(many=True)
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    """Recipes found for an id list and the ids that were not"""
+    results = RecipeDetailSerializer(many=True)
+    missing = serializers.ListField(child=serializers.IntegerField())
+
+
+class ImportLineSerializer(serializers.Serializer):
+    """Outcome of importing one NDJSON line"""
+    line = serializers.IntegerField()
+    id = serializers.IntegerField(required=False)
+    errors = serializers.DictField(required=False)
+
+
+class RecipeImportResultSerializer(serializers.Serializer):
+    """Number of created recipes and outcome per line"""
+    created = serializers.IntegerField()
+    results = ImportLineSerializer(many=True)
+
+
+class MergeDuplicatesSerializer(serializers.Serializer):
+    """Options and number of rows merged into another"""
+    fold_plurals = serializers.BooleanField(default=False, write_only=True)
+    merged = serializers.IntegerField(read_only=True)
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Recipe Image Serializer"""
 
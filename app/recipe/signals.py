@@ -0,0 +1,111 @@
+"""
+Signal handlers for recipe API caches
+"""
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from core.signals import (
+    duplicates_merged,
+    orphans_deleted,
+)
+from recipe.caching import bump_data_version
+from recipe.cards import schedule_card_refresh
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_version_on_write(sender, instance, **kwargs):
+    """Invalidate cached responses when user data changes"""
+    bump_data_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_version_on_link(sender, instance, action, **kwargs):
+    """Invalidate cached responses when recipe links change"""
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_data_version(instance.user_id)
+
+
+@receiver(orphans_deleted)
+@receiver(duplicates_merged)
+def bump_version_on_cleanup(sender, user_ids, **kwargs):
+    """Invalidate cached responses after set based maintenance"""
+    for user_id in user_ids:
+        bump_data_version(user_id)
+
+
+LINK_TABLES = {
+    Tag: (Recipe.tags.through, "tag_id"),
+    Ingredient: (Recipe.ingredients.through, "ingredient_id"),
+}
+
+
+def _linked_recipe_ids(instance):
+    through, related_id = LINK_TABLES[type(instance)]
+    return list(through.objects.filter(
+        **{related_id: instance.id},
+    ).values_list("recipe_id", flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_card(sender, instance, created, **kwargs):
+    """Regenerate the card of a saved recipe"""
+    schedule_card_refresh([instance.id], created)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_linked_cards(sender, instance, action, reverse, pk_set, **kwargs):
+    """Regenerate cards of recipes whose tags or ingredients changed"""
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            schedule_card_refresh([instance.id])
+    elif action in ("post_add", "post_remove"):
+        schedule_card_refresh(pk_set)
+    elif action == "pre_clear":
+        instance._card_recipe_ids = _linked_recipe_ids(instance)
+    elif action == "post_clear":
+        schedule_card_refresh(instance._card_recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def refresh_renamed_cards(sender, instance, created, **kwargs):
+    """Regenerate cards of recipes showing a renamed tag or ingredient"""
+    if not created:
+        schedule_card_refresh(_linked_recipe_ids(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_deleted_cards(sender, instance, **kwargs):
+    """Remember recipes linked to a tag or ingredient being deleted"""
+    instance._card_recipe_ids = _linked_recipe_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_deleted_cards(sender, instance, **kwargs):
+    """Regenerate cards of recipes that lost a tag or ingredient"""
+    schedule_card_refresh(instance._card_recipe_ids)
+
+
+@receiver(duplicates_merged)
+def refresh_merged_cards(sender, recipe_ids, **kwargs):
+    """Regenerate cards of recipes whose links moved to the kept row"""
+    schedule_card_refresh(recipe_ids)
@@ -0,0 +1,40 @@
+"""
+Test system checks of recipe API settings
+"""
+from django.test import (
+    SimpleTestCase,
+    override_settings,
+)
+
+from recipe.checks import check_recipe_cache_shared
+
+
+class RecipeCacheCheckTests(SimpleTestCase):
+    """Test recipe cache backend check"""
+
+    @override_settings(CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    })
+    def test_process_local_cache_warns(self):
+        """Test a cache private to each process is reported"""
+        errors = check_recipe_cache_shared(None)
+
+        self.assertEqual([error.id for error in errors], ["recipe.W001"])
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            },
+            "shared": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "recipe_cache",
+            },
+        },
+        RECIPE_CACHE="shared",
+    )
+    def test_shared_cache_passes(self):
+        """Test only the cache alias used by recipe APIs is checked"""
+        self.assertEqual(check_recipe_cache_shared(None), [])
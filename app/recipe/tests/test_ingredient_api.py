@@ -4,8 +4,10 @@ Test Ingredient API
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -16,9 +18,12 @@ from core.models import (
 )
 
 from recipe.serializers import IngredientSerializer
+from recipe.views import trigram_installed
 
 
 INGREDIENTS_URL = reverse("recipe:ingredient-list")
+AUTOCOMPLETE_URL = reverse("recipe:ingredient-autocomplete")
+MERGE_URL = reverse("recipe:ingredient-merge-duplicates")
 
 
 def create_recipe(user, **params):
@@ -79,7 +84,7 @@ class PrivateIngredientAPITests(TestCase):
         ingredients = Ingredient.objects.all().order_by("-name")
         serializer = IngredientSerializer(ingredients, many=True)
 
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_retrive_ingredient_only_to_correct_user(self):
         """Test get ingredient only for correct auth user"""
@@ -91,9 +96,9 @@ class PrivateIngredientAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], ingredient.name)
-        self.assertEqual(res.data[0]["id"], ingredient.id)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], ingredient.name)
+        self.assertEqual(res.data["results"][0]["id"], ingredient.id)
 
     def test_update_ingredient(self):
         """Test update INgredient"""
@@ -108,6 +113,24 @@ class PrivateIngredientAPITests(TestCase):
         ingredient.refresh_from_db()
         self.assertEqual(ingredient.name, payload["name"])
 
+    def test_update_ingredient_duplicate_name(self):
+        """Test renaming to a name the user already has is rejected"""
+        Ingredient.objects.create(user=self.user, name="Dessert")
+        Ingredient.objects.create(
+            user=create_user(email="other@mail.com"),
+            name="Soup",
+        )
+        ingredient = Ingredient.objects.create(user=self.user, name="vanilla")
+
+        res = self.client.patch(detail_url(ingredient.id), {"name": "Dessert"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.patch(detail_url(ingredient.id), {"name": "vanilla"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.patch(detail_url(ingredient.id), {"name": "Soup"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_delete_ingredient(self):
         """Test delete ingrdient"""
         ingredient = Ingredient.objects.create(user=self.user, name="vanilla")
@@ -135,8 +158,8 @@ class PrivateIngredientAPITests(TestCase):
         s1 = IngredientSerializer(ingredient1)
         s2 = IngredientSerializer(ingredient2)
 
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data["results"])
+        self.assertNotIn(s2.data, res.data["results"])
 
     def test_filter_ingredient_unique(self):
         """Test filtered ing return unique val"""
@@ -151,4 +174,81 @@ class PrivateIngredientAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_search_ingredients(self):
+        """Test search returns matching ingredients, most similar first"""
+        Ingredient.objects.create(user=self.user, name="Tomato")
+        Ingredient.objects.create(user=self.user, name="Potato")
+        Ingredient.objects.create(user=self.user, name="Dessert")
+        other_user = create_user(email="other@mail.com")
+        Ingredient.objects.create(user=other_user, name="Tomato")
+
+        res = self.client.get(INGREDIENTS_URL, {"search": "toma"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["name"] for t in res.data["results"]], ["Tomato"])
+        self.assertIsNone(res.data["next"])
+
+    def test_search_ingredients_with_typo(self):
+        """Test search tolerates typos"""
+        if not trigram_installed():
+            self.skipTest("pg_trgm is not installed")
+        Ingredient.objects.create(user=self.user, name="tomato")
+
+        res = self.client.get(INGREDIENTS_URL, {"search": "tomatoe"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["name"] for t in res.data["results"]], ["tomato"])
+
+    def test_autocomplete_ingredients(self):
+        """Test autocomplete returns user ingredients starting with prefix"""
+        Ingredient.objects.create(user=self.user, name="Tomato")
+        Ingredient.objects.create(user=self.user, name="tofu")
+        Ingredient.objects.create(user=self.user, name="Dessert")
+        other_user = create_user(email="other@mail.com")
+        Ingredient.objects.create(user=other_user, name="Tomatillo")
+
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "TO"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["name"] for t in res.data], ["tofu", "Tomato"])
+
+    def test_filter_ingredient_assigned_with_exists(self):
+        """Test assigned_only filters with a semi-join, not DISTINCT"""
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(ingredient)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(INGREDIENTS_URL, {"assigned_only": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertIn("EXISTS", queries[0]["sql"])
+        self.assertNotIn("DISTINCT", queries[0]["sql"])
+
+    def test_ingredients_paginated_by_name(self):
+        """Test ingredient pages follow the name ordering with a cursor"""
+        for name in ["Apple", "Basil", "Cumin"]:
+            Ingredient.objects.create(user=self.user, name=name)
+
+        res = self.client.get(INGREDIENTS_URL, {"page_size": 2})
+        names = [item["name"] for item in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        names += [item["name"] for item in res.data["results"]]
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(names, ["Cumin", "Basil", "Apple"])
+        self.assertIsNone(res.data["next"])
+
+    def test_merge_duplicate_ingredients_fold_plurals(self):
+        """Test merging plural ingredients into their singular"""
+        kept = Ingredient.objects.create(user=self.user, name="Tomato")
+        Ingredient.objects.create(user=self.user, name="tomatoes")
+
+        res = self.client.post(MERGE_URL, {"fold_plurals": True})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"merged": 1})
+        self.assertEqual(list(Ingredient.objects.all()), [kept])
@@ -2,13 +2,20 @@
 Test Recipe API
 """
 from decimal import Decimal
+import json
 import tempfile
 import os
+from unittest.mock import patch
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -24,9 +31,25 @@ from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer,
 )
+from recipe.caching import (
+    bump_data_version,
+    get_cache_stats,
+    get_data_version,
+)
+from recipe.cards import (
+    refresh_cards,
+    store_cards,
+)
+from recipe.pagination import RecipeCursorPagination
+from recipe.views import RecipeViewSet
 
 
 RECIPES_URL = reverse("recipe:recipe-list")
+FACETS_URL = reverse("recipe:recipe-facets")
+EXPORT_URL = reverse("recipe:recipe-export")
+IMPORT_URL = reverse("recipe:recipe-import")
+BULK_URL = reverse("recipe:recipe-bulk")
+BATCH_URL = reverse("recipe:recipe-batch")
 
 
 def detail_url(recipe_id):
@@ -93,7 +116,7 @@ class PrivateRecipeAPITests(TestCase):
         recipe_list_serialized = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, recipe_list_serialized.data)
+        self.assertEqual(res.data["results"], recipe_list_serialized.data)
 
     def test_recipe_list_limited_to_user(self):
         """Test list of recipe is limited to auth user"""
@@ -111,7 +134,7 @@ class PrivateRecipeAPITests(TestCase):
         recipe_list_serialized = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, recipe_list_serialized.data)
+        self.assertEqual(res.data["results"], recipe_list_serialized.data)
 
     def test_get_recipe_detail(self):
         """test get recipe Details"""
@@ -253,6 +276,22 @@ class PrivateRecipeAPITests(TestCase):
             ).exists()
             self.assertTrue(exists)
 
+    def test_create_tags_in_request_order(self):
+        """Test new tags are inserted in the order they were sent"""
+        names = [f"Tag {i}" for i in range(20, 0, -1)]
+        payload = {
+            "title": "Thai Prawn curry",
+            "time_minutes": 30,
+            "price": Decimal("10.5"),
+            "tags": [{"name": name} for name in names + names[:5]],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        tags = Tag.objects.filter(user=self.user).order_by("id")
+        self.assertEqual(list(tags.values_list("name", flat=True)), names)
+
     def test_create_recipe_with_existing_tag(self):
         """Test recipe creation with existing tag"""
         tag_indian = Tag.objects.create(user=self.user, name="Indian")
@@ -476,9 +515,9 @@ class PrivateRecipeAPITests(TestCase):
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data["results"])
+        self.assertIn(s2.data, res.data["results"])
+        self.assertNotIn(s3.data, res.data["results"])
 
     def test_filter_by_ingredient(self):
         """TEst filter recipe by ingredient"""
@@ -500,9 +539,895 @@ class PrivateRecipeAPITests(TestCase):
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data["results"])
+        self.assertIn(s2.data, res.data["results"])
+        self.assertNotIn(s3.data, res.data["results"])
+
+    def test_filter_by_many_tags_unique(self):
+        """Test recipe matching several filter tags is returned once"""
+        r1 = create_recipe(user=self.user, title="recipe1")
+        tag1 = Tag.objects.create(user=self.user, name="tag1")
+        tag2 = Tag.objects.create(user=self.user, name="tag2")
+        r1.tags.add(tag1, tag2)
+
+        params = {
+            "tags": f"{tag1.id},{tag2.id}"
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["id"], r1.id)
+        self.assertNotIn("DISTINCT", queries[0]["sql"])
+        self.assertIn("EXISTS", queries[0]["sql"])
+
+    def test_filter_by_all_tags(self):
+        """Test filter recipe having all requested tags"""
+        r1 = create_recipe(user=self.user, title="recipe1")
+        r2 = create_recipe(user=self.user, title="recipe2")
+        tag1 = Tag.objects.create(user=self.user, name="tag1")
+        tag2 = Tag.objects.create(user=self.user, name="tag2")
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+
+        params = {
+            "tags": f"{tag1.id},{tag2.id}",
+            "tags_mode": "all",
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data["results"]], [r1.id])
+
+    def test_filter_by_all_ingredients(self):
+        """Test filter recipe having all requested ingredients"""
+        r1 = create_recipe(user=self.user, title="recipe1")
+        r2 = create_recipe(user=self.user, title="recipe2")
+        ingredient1 = Ingredient.objects.create(user=self.user, name="ing1")
+        ingredient2 = Ingredient.objects.create(user=self.user, name="ing2")
+        r1.ingredients.add(ingredient1, ingredient2)
+        r2.ingredients.add(ingredient2)
+
+        params = {
+            "ingredients": f"{ingredient1.id},{ingredient2.id}",
+            "ingredients_mode": "all",
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data["results"]], [r1.id])
+
+    def test_filter_invalid_mode(self):
+        """Test unknown filter mode is rejected"""
+        params = {
+            "tags": "1",
+            "tags_mode": "some",
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipes_paginated_by_cursor(self):
+        """Test walking recipe pages by cursor returns every recipe once"""
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {"page_size": 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data["results"]), 2)
+            ids.extend(r["id"] for r in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get(res.data["next"])
+
+        self.assertEqual(ids, [r.id for r in reversed(recipes)])
+
+    def test_recipes_page_size_capped(self):
+        """Test page size cannot exceed the maximum"""
+        for _ in range(3):
+            create_recipe(user=self.user)
+
+        with patch.object(RecipeCursorPagination, "max_page_size", 2):
+            res = self.client.get(RECIPES_URL, {"page_size": 1000})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIsNotNone(res.data["next"])
+
+    def test_list_sparse_fields(self):
+        """Test list returns and loads only requested fields"""
+        recipe = create_recipe(user=self.user)
+
+        params = {"fields": "id,title,price"}
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [{
+            "id": recipe.id,
+            "title": recipe.title,
+            "price": str(recipe.price),
+        }])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("description", queries[0]["sql"])
+
+    def test_retrieve_sparse_fields(self):
+        """Test detail returns only requested fields"""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name="Lunch")
+        recipe.tags.add(tag)
+
+        params = {"fields": "description,tags"}
+        res = self.client.get(detail_url(recipe.id), params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            "description": recipe.description,
+            "tags": [{"id": tag.id, "name": tag.name}],
+        })
+
+    def test_sparse_fields_unknown(self):
+        """Test requesting unknown fields is rejected"""
+        res = self.client.get(RECIPES_URL, {"fields": "id,user"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes_ranked(self):
+        """Test search returns title matches before description matches"""
+        r1 = create_recipe(
+            user=self.user,
+            title="Creamy pasta",
+            description="Cook the tomatoes slowly",
+        )
+        r2 = create_recipe(user=self.user, title="Tomato soup")
+        create_recipe(user=self.user, title="Pancakes")
+
+        res = self.client.get(RECIPES_URL, {"q": "tomato"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [r["id"] for r in res.data["results"]]
+        self.assertEqual(ids, [r2.id, r1.id])
+
+    def test_search_recipes_paginated(self):
+        """Test walking search pages returns every match once"""
+        recipes = [
+            create_recipe(user=self.user, title="Tomato soup"),
+            create_recipe(user=self.user, title="Tomato tomato salad"),
+            create_recipe(user=self.user, description="Add a tomato"),
+        ]
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {"q": "tomato", "page_size": 1})
+        while True:
+            ids.extend(r["id"] for r in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get(res.data["next"])
+
+        self.assertEqual(sorted(ids), sorted(r.id for r in recipes))
+
+    def test_search_follows_updates(self):
+        """Test search sees the latest recipe title"""
+        recipe = create_recipe(user=self.user, title="Pancakes")
+
+        self.client.patch(detail_url(recipe.id), {"title": "Waffles"})
+        res = self.client.get(RECIPES_URL, {"q": "waffles"})
+
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["id"], recipe.id)
+
+    def test_search_highlight(self):
+        """Test search results include highlighted snippet"""
+        create_recipe(user=self.user, description="Simmer the tomato sauce")
+
+        params = {"q": "tomato", "highlight": 1}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("<b>tomato</b>", res.data["results"][0]["snippet"])
+
+    def test_search_invalid_highlight(self):
+        """Test highlight flag other than 0 or 1 is rejected"""
+        res = self.client.get(RECIPES_URL, {"q": "tomato", "highlight": "yes"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_time_and_price(self):
+        """Test range filters compose with tag filter"""
+        tag = Tag.objects.create(user=self.user, name="Quick")
+        r1 = create_recipe(user=self.user, time_minutes=20, price="8.00")
+        r2 = create_recipe(user=self.user, time_minutes=45, price="8.00")
+        r3 = create_recipe(user=self.user, time_minutes=20, price="12.00")
+        r4 = create_recipe(user=self.user, time_minutes=20, price="4.00")
+        for recipe in [r1, r2, r3, r4]:
+            recipe.tags.add(tag)
+        create_recipe(user=self.user, time_minutes=20, price="8.00")
+
+        params = {
+            "tags": f"{tag.id}",
+            "max_time": 30,
+            "min_price": "5",
+            "max_price": "10.00",
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data["results"]], [r1.id])
+
+    def test_filter_by_invalid_range(self):
+        """Test non numeric range filters are rejected"""
+        for params in [
+            {"max_time": "1.5"},
+            {"max_price": "cheap"},
+            {"max_price": "NaN"},
+            {"min_price": "-Infinity"},
+        ]:
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipe_facets(self):
+        """Test facets count recipes per tag and ingredient"""
+        tag1 = Tag.objects.create(user=self.user, name="Dinner")
+        tag2 = Tag.objects.create(user=self.user, name="Vegan")
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        r1 = create_recipe(user=self.user, time_minutes=10)
+        r2 = create_recipe(user=self.user, time_minutes=10)
+        r3 = create_recipe(user=self.user, time_minutes=60)
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+        r3.tags.add(tag2)
+        r3.ingredients.add(ingredient)
+        create_recipe(user=create_user(email="other@mail.com"))
+
+        with self.assertNumQueries(2):
+            res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["tags"], [
+            {"id": tag1.id, "name": "Dinner", "count": 2},
+            {"id": tag2.id, "name": "Vegan", "count": 2},
+        ])
+        self.assertEqual(res.data["ingredients"], [
+            {"id": ingredient.id, "name": "Salt", "count": 1},
+        ])
+
+        res = self.client.get(FACETS_URL, {"max_time": 30})
+
+        self.assertEqual(res.data["tags"], [
+            {"id": tag1.id, "name": "Dinner", "count": 2},
+            {"id": tag2.id, "name": "Vegan", "count": 1},
+        ])
+        self.assertEqual(res.data["ingredients"], [])
+
+    def test_list_not_modified(self):
+        """Test unchanged recipe list is answered with 304"""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                RECIPES_URL,
+                HTTP_IF_NONE_MATCH=res["ETag"],
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+
+    def test_retrieve_ignores_modified_since(self):
+        """Test only the ETag validates cached copies"""
+        recipe = create_recipe(user=self.user)
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertNotIn("Last-Modified", res)
+
+        res = self.client.get(
+            detail_url(recipe.id),
+            HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_changes_on_write(self):
+        """Test recipe and link writes change the ETag"""
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(RECIPES_URL)["ETag"]
+
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        etag_tag = self.client.get(RECIPES_URL)["ETag"]
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag_tag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn(res["ETag"], [etag, etag_tag])
+
+    def test_etag_depends_on_query(self):
+        """Test different query strings get different ETags"""
+        create_recipe(user=self.user)
+        etag = self.client.get(RECIPES_URL)["ETag"]
+
+        res = self.client.get(
+            RECIPES_URL,
+            {"max_time": 5},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [])
+
+    def test_list_served_from_cache(self):
+        """Test repeated list reads are served from the response cache"""
+        create_recipe(user=self.user)
+        stats = get_cache_stats()
+        res = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(RECIPES_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.content, res.content)
+        self.assertEqual(cached["ETag"], res["ETag"])
+        self.assertEqual(get_cache_stats(), {
+            "hits": stats["hits"] + 1,
+            "misses": stats["misses"] + 1,
+        })
+
+    def test_cache_invalidated_on_write(self):
+        """Test writes are visible to the next cached read"""
+        recipe = create_recipe(user=self.user, title="Old title")
+        self.client.get(detail_url(recipe.id))
+
+        self.client.patch(detail_url(recipe.id), {"title": "New title"})
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.json()["title"], "New title")
+
+    def test_cache_file_backend(self):
+        """Test responses can be cached in a file based backend"""
+        create_recipe(user=self.user)
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(
+                CACHES={
+                    "default": {
+                        "BACKEND": (
+                            "django.core.cache.backends.locmem.LocMemCache"
+                        ),
+                    },
+                    "recipe": {
+                        "BACKEND": (
+                            "django.core.cache.backends.filebased"
+                            ".FileBasedCache"
+                        ),
+                        "LOCATION": location,
+                    },
+                },
+                RECIPE_CACHE="recipe",
+            ):
+                res = self.client.get(RECIPES_URL)
+                with self.assertNumQueries(0):
+                    cached = self.client.get(RECIPES_URL)
+
+                self.assertTrue(os.listdir(location))
+
+        self.assertEqual(cached.content, res.content)
+
+    def test_export_recipes_json(self):
+        """Test export streams every recipe of the user as a JSON array"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        for i in range(3):
+            create_recipe(user=self.user, title=f"Recipe {i}").tags.add(tag)
+        create_recipe(user=create_user(email="other@mail.com"))
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "application/json")
+        recipes = Recipe.objects.filter(user=self.user).order_by("-id")
+        serializer = RecipeDetailSerializer(recipes, many=True)
+        data = json.loads(b"".join(res.streaming_content))
+        self.assertEqual(data, serializer.data)
+
+    def test_export_recipes_ndjson(self):
+        """Test export streams one recipe per line in NDJSON"""
+        create_recipe(user=self.user, title="Curry", time_minutes=60)
+        create_recipe(user=self.user, title="Salad", time_minutes=5)
+
+        res = self.client.get(
+            EXPORT_URL,
+            {"export_format": "ndjson", "max_time": 30},
+        )
+
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["title"] for line in lines], [
+            "Salad",
+        ])
+
+    @patch.object(RecipeViewSet, "export_chunk_size", 2)
+    def test_export_queries_per_chunk(self):
+        """Test export prefetches related names once per chunk"""
+        recipes = [create_recipe(user=self.user) for i in range(5)]
+        for recipe in recipes:
+            recipe.tags.create(user=self.user, name=f"tag {recipe.id}")
+
+        with self.assertNumQueries(7):
+            res = self.client.get(EXPORT_URL)
+            lines = json.loads(b"".join(res.streaming_content))
+
+        self.assertEqual(len(lines), 5)
+
+    def test_export_invalid_format(self):
+        """Test unknown export formats are rejected"""
+        res = self.client.get(EXPORT_URL, {"export_format": "xml"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_recipes(self):
+        """Test NDJSON import creates recipes and reports every line"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        lines = [
+            {
+                "title": "Curry",
+                "time_minutes": 30,
+                "price": "4.50",
+                "description": "Hot",
+                "tags": [{"name": "Vegan"}, {"name": "Dinner"}],
+                "ingredients": [{"name": "Rice"}],
+            },
+            {"title": "No time", "price": "1.00"},
+            {
+                "title": "Soup",
+                "time_minutes": 15,
+                "price": "2.00",
+                "tags": [{"name": "Dinner"}, {"name": "Dinner"}],
+            },
+        ]
+        body = "\n".join(json.dumps(line) for line in lines) + "\n\nnot json\n"
+
+        res = self.client.post(
+            IMPORT_URL,
+            body,
+            content_type="application/x-ndjson",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["created"], 2)
+        results = res.data["results"]
+        self.assertEqual([r["line"] for r in results], [1, 2, 3, 5])
+        self.assertIn("time_minutes", results[1]["errors"])
+        self.assertIn("non_field_errors", results[3]["errors"])
+        curry = Recipe.objects.get(id=results[0]["id"])
+        self.assertEqual(curry.user, self.user)
+        self.assertEqual(curry.description, "Hot")
+        self.assertEqual(
+            sorted(tag.name for tag in curry.tags.all()),
+            ["Dinner", "Vegan"],
+        )
+        self.assertEqual(curry.ingredients.get().name, "Rice")
+        soup = Recipe.objects.get(id=results[2]["id"])
+        self.assertEqual(soup.tags.get().name, "Dinner")
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    @patch.object(RecipeViewSet, "import_chunk_size", 2)
+    def test_import_queries_per_chunk(self):
+        """Test import writes each chunk with a fixed number of queries"""
+        body = "".join(
+            json.dumps({
+                "title": f"Recipe {i}",
+                "time_minutes": 5,
+                "price": "1.00",
+                "tags": [{"name": f"tag {i}"}],
+                "ingredients": [{"name": "Salt"}],
+            }) + "\n"
+            for i in range(4)
+        )
+
+        # The second chunk finds Salt in the identity map of the request
+        # and only locks its row again
+        with self.assertNumQueries(24):
+            res = self.client.post(
+                IMPORT_URL,
+                body,
+                content_type="application/x-ndjson",
+            )
+
+        self.assertEqual(res.data["created"], 4)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 4)
+
+    def test_import_visible_to_cached_list(self):
+        """Test imported recipes are not hidden by the response cache"""
+        self.client.get(RECIPES_URL)
+
+        self.client.post(
+            IMPORT_URL,
+            json.dumps({"title": "Soup", "time_minutes": 5, "price": "1"}),
+            content_type="application/x-ndjson",
+        )
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.json()["results"]), 1)
+
+    def test_bulk_create_recipes(self):
+        """Test bulk create adds all recipes in request order"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        payload = [
+            {
+                "title": "Curry",
+                "time_minutes": 30,
+                "price": "4.50",
+                "tags": [{"name": "Vegan"}, {"name": "Dinner"}],
+            },
+            {"title": "Soup", "time_minutes": 10, "price": "2.00"},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r["title"] for r in res.data], ["Curry", "Soup"])
+        curry = Recipe.objects.get(id=res.data[0]["id"])
+        self.assertEqual(curry.user, self.user)
+        self.assertEqual(
+            sorted(tag.name for tag in curry.tags.all()),
+            ["Dinner", "Vegan"],
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_invalid(self):
+        """Test bulk create is all or nothing"""
+        payload = [
+            {"title": "Curry", "time_minutes": 30, "price": "4.50"},
+            {"title": "No time", "price": "2.00"},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_update_recipes(self):
+        """Test bulk PATCH changes fields and tags of listed recipes"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        r1 = create_recipe(user=self.user, title="Curry")
+        r2 = create_recipe(user=self.user, title="Soup")
+        r3 = create_recipe(user=self.user, title="Salad")
+        r1.tags.add(tag)
+        payload = [
+            {"id": r2.id, "price": "9.99"},
+            {"id": r1.id, "tags": [{"name": "Dinner"}]},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in res.data], [r2.id, r1.id])
+        for recipe in [r1, r2, r3]:
+            recipe.refresh_from_db()
+        self.assertEqual(r2.price, Decimal("9.99"))
+        self.assertEqual(r1.price, Decimal("5.99"))
+        self.assertEqual(r3.price, Decimal("5.99"))
+        self.assertEqual([t.name for t in r1.tags.all()], ["Dinner"])
+        self.assertEqual(res.data[1]["tags"][0]["name"], "Dinner")
+
+    def test_bulk_update_other_user_recipe(self):
+        """Test bulk PATCH fails as a whole on recipes of other users"""
+        recipe = create_recipe(user=self.user, title="Curry")
+        other = create_recipe(user=create_user(email="other@mail.com"))
+        payload = [
+            {"id": recipe.id, "title": "Changed"},
+            {"id": other.id, "title": "Changed"},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(recipe.title, "Curry")
+        self.assertNotEqual(other.title, "Changed")
+
+    def test_bulk_delete_by_ids(self):
+        """Test bulk DELETE removes listed recipes of the user only"""
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+        other = create_recipe(user=create_user(email="other@mail.com"))
+
+        res = self.client.delete(
+            BULK_URL,
+            {"ids": [r1.id, other.id]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["deleted"], 1)
+        self.assertFalse(Recipe.objects.filter(id=r1.id).exists())
+        self.assertTrue(Recipe.objects.filter(id=r2.id).exists())
+        self.assertTrue(Recipe.objects.filter(id=other.id).exists())
+
+    def test_bulk_delete_by_filter(self):
+        """Test bulk DELETE accepts the list filters"""
+        create_recipe(user=self.user, time_minutes=5)
+        slow = create_recipe(user=self.user, time_minutes=60)
+
+        res = self.client.delete(f"{BULK_URL}?max_time=30")
+
+        self.assertEqual(res.data["deleted"], 1)
+        self.assertEqual(
+            list(Recipe.objects.filter(user=self.user)),
+            [slow],
+        )
+
+        res = self.client.delete(BULK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(id=slow.id).exists())
+
+    def test_bulk_boolean_ids_rejected(self):
+        """Test bulk PATCH and DELETE reject JSON booleans as ids"""
+        recipe = create_recipe(user=self.user, title="Curry")
+
+        res = self.client.patch(
+            BULK_URL,
+            [{"id": True, "title": "Changed"}],
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.delete(BULK_URL, {"ids": [True]}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "Curry")
+
+    def test_bulk_delete_empty_filter_rejected(self):
+        """Test bulk DELETE with empty filters or only modes deletes nothing"""
+        create_recipe(user=self.user)
+        create_recipe(user=self.user)
+
+        for query in [
+            "tags=",
+            "tags_mode=all",
+            "ingredients_mode=any",
+            "max_time=",
+            "min_price=&max_price=",
+            "q=",
+        ]:
+            with self.subTest(query=query):
+                res = self.client.delete(f"{BULK_URL}?{query}")
+
+                self.assertEqual(
+                    res.status_code,
+                    status.HTTP_400_BAD_REQUEST,
+                )
+                self.assertEqual(
+                    Recipe.objects.filter(user=self.user).count(),
+                    2,
+                )
+
+    @patch.object(RecipeViewSet, "bulk_max_batch_size", 1)
+    def test_bulk_batch_size_limited(self):
+        """Test bulk requests above the batch size are rejected"""
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+
+        res = self.client.delete(
+            BULK_URL,
+            {"ids": [r1.id, r2.id]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_batch_recipes(self):
+        """Test batch fetch keeps requested order and reports missing ids"""
+        r1 = create_recipe(user=self.user, title="Curry")
+        r2 = create_recipe(user=self.user, title="Soup")
+        r1.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+        other = create_recipe(user=create_user(email="other@mail.com"))
+        ids = [r2.id, other.id, r1.id, 0, r2.id]
+
+        with self.assertNumQueries(3):
+            res = self.client.get(
+                BATCH_URL,
+                {"ids": ",".join(str(pk) for pk in ids)},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        serializer = RecipeDetailSerializer([r2, r1], many=True)
+        self.assertEqual(res.data["results"], serializer.data)
+        self.assertEqual(res.data["missing"], [other.id, 0])
+
+    def test_batch_invalid_ids(self):
+        """Test batch fetch rejects malformed and too long id lists"""
+        for ids in ["", "1,a", ",".join(str(pk) for pk in range(1, 102))]:
+            res = self.client.get(BATCH_URL, {"ids": ids})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fast_list_parity(self):
+        """Test the fast list path renders the same bytes as serializers"""
+        for i in range(3):
+            recipe = create_recipe(
+                user=self.user,
+                title=f"Spicy curry {i}",
+                price=Decimal(f"{i}.5"),
+                link="" if i else "http://example.com/r",
+            )
+            for j in range(i):
+                recipe.tags.add(Tag.objects.create(
+                    user=self.user,
+                    name=f"tag {i}-{j}",
+                ))
+            recipe.ingredients.add(Ingredient.objects.get_or_create(
+                user=self.user,
+                name="Rice",
+            )[0])
+
+        for params in [{}, {"page_size": 2}, {"q": "curry"}]:
+            fast = self.client.get(RECIPES_URL, params)
+            bump_data_version(self.user.id)
+            with patch.object(RecipeViewSet, "fast_list", False):
+                slow = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(fast.content, slow.content)
+            self.assertEqual(fast.status_code, status.HTTP_200_OK)
+
+    def test_card_stored_on_create(self):
+        """Test creating a recipe stores its list card"""
+        payload = {
+            "title": "Curry",
+            "time_minutes": 30,
+            "price": "5.50",
+            "tags": [{"name": "Indian"}],
+            "ingredients": [{"name": "Rice"}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        recipe = Recipe.objects.get(id=res.data["id"])
+        card = json.loads(recipe.card)
+        self.assertEqual(card["title"], "Curry")
+        self.assertEqual(card["price"], "5.50")
+        self.assertEqual([tag["name"] for tag in card["tags"]], ["Indian"])
+        self.assertEqual(
+            [ingredient["name"] for ingredient in card["ingredients"]],
+            ["Rice"],
+        )
+
+    def test_card_updated_on_patch(self):
+        """Test updating a recipe refreshes its card"""
+        recipe = create_recipe(user=self.user)
+
+        self.client.patch(detail_url(recipe.id), {"title": "New title"})
+
+        recipe.refresh_from_db()
+        self.assertEqual(json.loads(recipe.card)["title"], "New title")
+
+    def test_card_follows_tag_rename(self):
+        """Test renaming a tag refreshes cards of recipes using it"""
+        tag = Tag.objects.create(user=self.user, name="Dinner")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        self.client.patch(
+            reverse("recipe:tag-detail", args=[tag.id]),
+            {"name": "Supper"},
+        )
+
+        recipe.refresh_from_db()
+        self.assertEqual(
+            json.loads(recipe.card)["tags"],
+            [{"id": tag.id, "name": "Supper"}],
+        )
+
+    def test_card_drops_deleted_ingredient(self):
+        """Test deleting an ingredient refreshes cards of recipes using it"""
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(ingredient)
+
+        self.client.delete(
+            reverse("recipe:ingredient-detail", args=[ingredient.id]),
+        )
+
+        recipe.refresh_from_db()
+        self.assertEqual(json.loads(recipe.card)["ingredients"], [])
+
+    def test_list_fills_missing_cards(self):
+        """Test listing renders and stores cards that were never built"""
+        recipe = create_recipe(user=self.user, title="Soup")
+        Recipe.objects.filter(id=recipe.id).update(card=None)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"][0]["title"], "Soup")
+        recipe.refresh_from_db()
+        self.assertEqual(
+            json.loads(recipe.card),
+            json.loads(res.content)["results"][0],
+        )
+
+    @patch("recipe.cards.refresh_cards")
+    def test_write_clears_card(self, patched_refresh):
+        """Test a write clears the card until it is rendered again"""
+        recipe = create_recipe(user=self.user)
+        Recipe.objects.filter(id=recipe.id).update(card="{}")
+
+        self.client.patch(detail_url(recipe.id), {"title": "New title"})
+
+        recipe.refresh_from_db()
+        self.assertIsNone(recipe.card)
+        patched_refresh.assert_called_with({recipe.id})
+
+    def test_read_keeps_newer_card(self):
+        """Test a card rendered on read does not replace a stored one"""
+        recipe = create_recipe(user=self.user, title="Soup")
+
+        store_cards([recipe.id], ['{"title": "Old"}'])
+
+        recipe.refresh_from_db()
+        self.assertEqual(json.loads(recipe.card)["title"], "Soup")
+
+    def test_card_refresh_bumps_data_version(self):
+        """Test lists cached with old cards are retired by a refresh"""
+        recipe = create_recipe(user=self.user)
+        version = get_data_version(self.user.id)
+
+        refresh_cards([recipe.id])
+
+        self.assertNotEqual(get_data_version(self.user.id), version)
+
+    @patch.object(RecipeViewSet, "import_chunk_size", 1)
+    def test_import_looks_up_names_once(self):
+        """Test import chunks reuse tags resolved earlier in the request"""
+        body = "".join(
+            json.dumps({
+                "title": f"Recipe {i}",
+                "time_minutes": 5,
+                "price": "1.00",
+                "tags": [{"name": "Dinner"}],
+            }) + "\n"
+            for i in range(3)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(
+                IMPORT_URL,
+                body,
+                content_type="application/x-ndjson",
+            )
+
+        self.assertEqual(res.data["created"], 3)
+        tag_selects = [
+            query for query in queries
+            if query["sql"].startswith("SELECT")
+            and '"core_tag"."name" IN' in query["sql"]
+        ]
+        # Lookup and re-select after insert, both in the first chunk only,
+        # later chunks lock the row by id
+        self.assertEqual(len(tag_selects), 2)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_response_renders_shared_tag_once(self):
+        """Test recipes sharing a tag reuse its rendered representation"""
+        payload = [
+            {
+                "title": title,
+                "time_minutes": 10,
+                "price": "2.00",
+                "tags": [{"name": "Dinner"}],
+            }
+            for title in ["Curry", "Soup"]
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIs(res.data[0]["tags"][0], res.data[1]["tags"][0])
 
 
 class ImageUplaodTests(TestCase):
@@ -0,0 +1,68 @@
+"""
+Test recipe filters are served by indexes
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def explain_list_query(client, params):
+    """Run recipe list request and return plan of its main query"""
+    with CaptureQueriesContext(connection) as queries:
+        res = client.get(RECIPES_URL, params)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {queries[0]['sql']}")
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+
+    return res, plan
+
+
+class RecipeIndexTests(TestCase):
+    """Test query plans of recipe filters"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@mail.com",
+            password="password",
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=self.user,
+                title=f"Recipe {i}",
+                time_minutes=i % 200,
+                price=Decimal(i % 500),
+            )
+            for i in range(5000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_recipe")
+
+    def test_max_time_uses_index(self):
+        """Test filtering by max time scans the time index"""
+        res, plan = explain_list_query(self.client, {"max_time": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("core_recipe_user_time_idx", plan)
+
+    def test_price_range_uses_index(self):
+        """Test filtering by price range scans the price index"""
+        params = {"min_price": "10", "max_price": "11"}
+        res, plan = explain_list_query(self.client, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("core_recipe_user_price_idx", plan)
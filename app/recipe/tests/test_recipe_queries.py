@@ -0,0 +1,182 @@
+"""
+Test query budgets for Recipe API
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+DATASET_SIZES = [1, 10, 50]
+
+
+def detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def create_recipes(user, count, related=3):
+    """Create recipes each linked to its own tags and ingredients"""
+    recipes = []
+    for i in range(count):
+        recipe = Recipe.objects.create(
+            user=user,
+            title=f"Recipe {i}",
+            time_minutes=10,
+            price=Decimal("5.99"),
+            description="Sample description",
+        )
+        for j in range(related):
+            recipe.tags.add(
+                Tag.objects.create(user=user, name=f"tag {recipe.id}-{j}")
+            )
+            recipe.ingredients.add(Ingredient.objects.create(
+                user=user,
+                name=f"ing {recipe.id}-{j}",
+            ))
+        recipes.append(recipe)
+
+    return recipes
+
+
+class RecipeQueryBudgetTests(TestCase):
+    """Test number of queries per endpoint does not grow with data"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@mail.com",
+            password="password",
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_query_budget(self):
+        """Test listing recipes costs the same for any number of recipes"""
+        created = 0
+        for size in DATASET_SIZES:
+            create_recipes(self.user, size - created)
+            created = size
+            with self.subTest(size=size):
+                # Cards are stored on write, listing is one select
+                with self.assertNumQueries(1):
+                    res = self.client.get(RECIPES_URL)
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(res.data["results"]), size)
+
+    def test_retrieve_query_budget(self):
+        """Test retrieve costs the same for any number of tags"""
+        for size in DATASET_SIZES:
+            recipe = create_recipes(self.user, 1, related=size)[0]
+            with self.subTest(size=size):
+                with self.assertNumQueries(3):
+                    res = self.client.get(detail_url(recipe.id))
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(res.data["tags"]), size)
+                self.assertEqual(len(res.data["ingredients"]), size)
+
+    def test_update_query_budget(self):
+        """Test update costs the same for any number of tags"""
+        for size in DATASET_SIZES:
+            recipe = create_recipes(self.user, 1, related=size)[0]
+            with self.subTest(size=size):
+                with self.assertNumQueries(11):
+                    res = self.client.patch(
+                        detail_url(recipe.id),
+                        {"title": "New title"},
+                    )
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(res.data["tags"]), size)
+
+    def test_update_tags_query_budget(self):
+        """Test swapping one tag costs the same for any number of tags"""
+        for size in DATASET_SIZES:
+            recipe = create_recipes(self.user, 1, related=size)[0]
+            names = [tag.name for tag in recipe.tags.order_by("id")]
+            links = Recipe.tags.through.objects.filter(recipe=recipe)
+            kept = list(links.order_by("id").values_list("id", flat=True))[1:]
+            Tag.objects.create(user=self.user, name=f"new {size}")
+            payload = {
+                "tags": [{"name": name} for name in names[1:]]
+                + [{"name": f"new {size}"}],
+            }
+            with self.subTest(size=size):
+                with self.assertNumQueries(18):
+                    res = self.client.patch(
+                        detail_url(recipe.id),
+                        payload,
+                        format="json",
+                    )
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    sorted(tag["name"] for tag in res.data["tags"]),
+                    sorted(names[1:] + [f"new {size}"]),
+                )
+                self.assertEqual(links.filter(id__in=kept).count(), len(kept))
+
+    def test_create_query_budget(self):
+        """Test create costs the same for any number of new names"""
+        for size in DATASET_SIZES:
+            payload = {
+                "title": f"Recipe {size}",
+                "time_minutes": 10,
+                "price": "5.99",
+                "tags": [{"name": f"tag {size}-{i}"} for i in range(size)],
+                "ingredients": [
+                    {"name": f"ing {size}-{i}"} for i in range(size)
+                ],
+            }
+            with self.subTest(size=size):
+                with self.assertNumQueries(19):
+                    res = self.client.post(RECIPES_URL, payload, format="json")
+
+                self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+                self.assertEqual(len(res.data["tags"]), size)
+                self.assertEqual(len(res.data["ingredients"]), size)
+
+    def test_create_existing_names_query_budget(self):
+        """Test create with known names skips the name inserts"""
+        for size in DATASET_SIZES:
+            recipe = create_recipes(self.user, 1, related=size)[0]
+            payload = {
+                "title": f"Copy {size}",
+                "time_minutes": 10,
+                "price": "5.99",
+                "tags": [{"name": tag.name} for tag in recipe.tags.all()],
+                "ingredients": [
+                    {"name": ing.name} for ing in recipe.ingredients.all()
+                ],
+            }
+            tag_count = Tag.objects.count()
+            with self.subTest(size=size):
+                with self.assertNumQueries(15):
+                    res = self.client.post(RECIPES_URL, payload, format="json")
+
+                self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+                self.assertEqual(len(res.data["tags"]), size)
+                self.assertEqual(Tag.objects.count(), tag_count)
+
+    def test_deep_page_query_budget(self):
+        """Test following a cursor costs the same as the first page"""
+        create_recipes(self.user, 30, related=1)
+
+        res = self.client.get(RECIPES_URL, {"page_size": 5})
+        while res.data["next"]:
+            with self.assertNumQueries(1):
+                res = self.client.get(res.data["next"])
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
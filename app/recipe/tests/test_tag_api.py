@@ -2,10 +2,13 @@
 Test Tag API
 """
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -16,9 +19,15 @@ from core.models import (
 )
 
 from recipe.serializers import TagSerializer
+from recipe.views import (
+    TagViewSet,
+    trigram_installed,
+)
 
 
 TAGS_URL = reverse("recipe:tag-list")
+AUTOCOMPLETE_URL = reverse("recipe:tag-autocomplete")
+MERGE_URL = reverse("recipe:tag-merge-duplicates")
 
 
 def create_recipe(user, **params):
@@ -78,7 +87,7 @@ class PrivateTagApiTests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_retrive_user_only_tag(self):
         """Test if user created tags only returned"""
@@ -91,9 +100,9 @@ class PrivateTagApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], tags.name)
-        self.assertEqual(res.data[0]["id"], tags.id)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], tags.name)
+        self.assertEqual(res.data["results"][0]["id"], tags.id)
 
     def test_update_tag_detail(self):
         """Test update tag func"""
@@ -108,6 +117,24 @@ class PrivateTagApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload["name"])
 
+    def test_update_tag_duplicate_name(self):
+        """Test renaming to a name the user already has is rejected"""
+        Tag.objects.create(user=self.user, name="Dessert")
+        Tag.objects.create(
+            user=create_user(email="other@mail.com"),
+            name="Soup",
+        )
+        tag = Tag.objects.create(user=self.user, name="dinner")
+
+        res = self.client.patch(detail_url(tag.id), {"name": "Dessert"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.patch(detail_url(tag.id), {"name": "dinner"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.patch(detail_url(tag.id), {"name": "Soup"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_delete_tag(self):
         """Test delete fucn"""
         tag = Tag.objects.create(user=self.user, name="dinner")
@@ -132,8 +159,8 @@ class PrivateTagApiTests(TestCase):
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
 
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data["results"])
+        self.assertNotIn(s2.data, res.data["results"])
 
     def test_filter_tag_unique(self):
         """Test filtered ing return unique val"""
@@ -148,4 +175,173 @@ class PrivateTagApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_search_tags(self):
+        """Test search returns matching tags, most similar first"""
+        Tag.objects.create(user=self.user, name="Tomato")
+        Tag.objects.create(user=self.user, name="Potato")
+        Tag.objects.create(user=self.user, name="Dessert")
+        other_user = create_user(email="other@mail.com")
+        Tag.objects.create(user=other_user, name="Tomato")
+
+        res = self.client.get(TAGS_URL, {"search": "toma"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["name"] for t in res.data["results"]], ["Tomato"])
+        self.assertIsNone(res.data["next"])
+
+    def test_search_tags_with_typo(self):
+        """Test search tolerates typos"""
+        if not trigram_installed():
+            self.skipTest("pg_trgm is not installed")
+        Tag.objects.create(user=self.user, name="tomato")
+
+        res = self.client.get(TAGS_URL, {"search": "tomatoe"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["name"] for t in res.data["results"]], ["tomato"])
+
+    def test_autocomplete_tags(self):
+        """Test autocomplete returns user tags starting with prefix"""
+        Tag.objects.create(user=self.user, name="Tomato")
+        Tag.objects.create(user=self.user, name="tofu")
+        Tag.objects.create(user=self.user, name="Dessert")
+        other_user = create_user(email="other@mail.com")
+        Tag.objects.create(user=other_user, name="Tomatillo")
+
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "TO"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["name"] for t in res.data], ["tofu", "Tomato"])
+
+    def test_autocomplete_cached_until_write(self):
+        """Test autocomplete is served from memory and sees new names"""
+        Tag.objects.create(user=self.user, name="Tomato")
+        self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+        self.assertEqual([t["name"] for t in res.data], ["Tomato"])
+
+        Tag.objects.create(user=self.user, name="Toast")
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        self.assertEqual([t["name"] for t in res.data], ["Toast", "Tomato"])
+
+    @patch.object(TagViewSet, "trie_max_size", 1)
+    def test_autocomplete_large_vocabulary(self):
+        """Test autocomplete falls back to the database for big vocabularies"""
+        Tag.objects.create(user=self.user, name="Tomato")
+        Tag.objects.create(user=self.user, name="tofu")
+        Tag.objects.create(user=self.user, name="Dessert")
+
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t["name"] for t in res.data], ["tofu", "Tomato"])
+
+    @patch("recipe.trie.MAX_CACHED_NODES", 10)
+    def test_autocomplete_cache_bounded_by_nodes(self):
+        """Test cached tries are evicted to stay within the node bound"""
+        other_user = create_user(email="other@mail.com")
+        Tag.objects.create(user=self.user, name="Tomato")
+        Tag.objects.create(user=other_user, name="Toast")
+        self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        self.client.force_authenticate(other_user)
+        self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+        with self.assertNumQueries(0):
+            res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+        self.assertEqual([t["name"] for t in res.data], ["Toast"])
+
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "to"})
+
+        self.assertTrue(queries.captured_queries)
+        self.assertEqual([t["name"] for t in res.data], ["Tomato"])
+
+    def test_autocomplete_same_order_without_trie(self):
+        """Test the trie and database fallback order names alike"""
+        for name in ["aZ", "ab", "a_b", "AB", "a b"]:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {"prefix": "a"})
+        with patch.object(TagViewSet, "trie_max_size", 1):
+            fallback = self.client.get(AUTOCOMPLETE_URL, {"prefix": "a"})
+
+        names = [t["name"] for t in res.data]
+        self.assertEqual(names, ["a b", "a_b", "ab", "AB", "aZ"])
+        self.assertEqual(fallback.data, res.data)
+
+    def test_tags_not_modified(self):
+        """Test unchanged tag list is answered with 304"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        res = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_tags_modified_by_recipe_link(self):
+        """Test assigning a tag to a recipe changes the ETag"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(TAGS_URL, {"assigned_only": 1})["ETag"]
+
+        recipe.tags.add(tag)
+        res = self.client.get(
+            TAGS_URL,
+            {"assigned_only": 1},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"][0]["name"], "Vegan")
+
+    def test_filter_tag_assigned_with_exists(self):
+        """Test assigned_only filters with a semi-join, not DISTINCT"""
+        tag = Tag.objects.create(user=self.user, name="Salt")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertIn("EXISTS", queries[0]["sql"])
+        self.assertNotIn("DISTINCT", queries[0]["sql"])
+
+    def test_tags_paginated_by_name(self):
+        """Test tag pages follow the name ordering with a cursor"""
+        for name in ["Apple", "Basil", "Cumin"]:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {"page_size": 2})
+        names = [item["name"] for item in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        names += [item["name"] for item in res.data["results"]]
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(names, ["Cumin", "Basil", "Apple"])
+        self.assertIsNone(res.data["next"])
+
+    def test_merge_duplicate_tags(self):
+        """Test merging tags of the user differing in case and spacing"""
+        other = create_user(email="other@mail.com")
+        kept = Tag.objects.create(user=self.user, name="Vegan")
+        duplicate = Tag.objects.create(user=self.user, name="vegan ")
+        Tag.objects.create(user=other, name="Vegan")
+        Tag.objects.create(user=other, name="vegan")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(duplicate)
+
+        res = self.client.post(MERGE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"merged": 1})
+        self.assertEqual(list(recipe.tags.all()), [kept])
+        self.assertEqual(Tag.objects.filter(user=other).count(), 2)
@@ -0,0 +1,111 @@
+"""
+In-process prefix trie cache for tag and ingredient names
+"""
+from collections import OrderedDict
+from threading import Lock
+
+
+# Each trie node takes about 300 bytes, so the cache of a process stays
+# below roughly 60 MB. A trie with more nodes is not kept and autocomplete
+# of that vocabulary falls back to the database
+MAX_CACHED_NODES = 200000
+MAX_CACHED_TRIES = 1000
+
+_tries = OrderedDict()
+_cached_nodes = 0
+_lock = Lock()
+
+
+class TrieNode:
+    """Node holding children by character and items ending here"""
+    __slots__ = ("children", "items")
+
+    def __init__(self):
+        self.children = {}
+        self.items = []
+
+
+class Trie:
+    """Case insensitive prefix tree of id and name pairs"""
+
+    def __init__(self, items=()):
+        self.root = TrieNode()
+        self.size = 1
+        for pk, name in items:
+            self.insert(pk, name)
+
+    def insert(self, pk, name):
+        """Add a name to the trie"""
+        node = self.root
+        for char in name.lower():
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = TrieNode()
+                self.size += 1
+            node = child
+        node.items.append({"id": pk, "name": name})
+
+    def complete(self, prefix, limit):
+        """Return up to limit items starting with prefix
+
+        Items come in code point order of the lower case name, then in
+        insertion order.
+        """
+        node = self.root
+        for char in prefix.lower():
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        results = []
+        stack = [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            results.extend(node.items)
+            stack.extend(
+                node.children[char]
+                for char in sorted(node.children, reverse=True)
+            )
+
+        return results[:limit]
+
+
+def _entry_size(entry):
+    """Return number of trie nodes held by a cache entry"""
+    trie = entry[1]
+    return 0 if trie is None else trie.size
+
+
+def get_trie(model, user_id, max_size, version):
+    """Return cached trie of user names, None if vocabulary is too large"""
+    global _cached_nodes
+
+    key = (model._meta.label, user_id)
+    with _lock:
+        entry = _tries.get(key)
+        if entry is not None and entry[0] == version:
+            _tries.move_to_end(key)
+            return entry[1]
+
+    items = list(
+        model.objects.filter(user_id=user_id).order_by("id")
+        .values_list("id", "name")[:max_size + 1]
+    )
+    trie = Trie(items) if len(items) <= max_size else None
+    if trie is not None and trie.size > MAX_CACHED_NODES:
+        trie = None
+
+    entry = (version, trie)
+    with _lock:
+        old = _tries.pop(key, None)
+        if old is not None:
+            _cached_nodes -= _entry_size(old)
+        _tries[key] = entry
+        _cached_nodes += _entry_size(entry)
+        while (
+            _cached_nodes > MAX_CACHED_NODES
+            or len(_tries) > MAX_CACHED_TRIES
+        ):
+            _cached_nodes -= _entry_size(_tries.popitem(last=False)[1])
+
+    return trie
@@ -7,81 +7,717 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
+from decimal import (
+    Decimal,
+    InvalidOperation,
+)
+from functools import lru_cache
+import json
+
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.conf import settings
+from django.db import (
+    connection,
+    transaction,
+)
+from django.http import StreamingHttpResponse
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    FloatField,
+    OuterRef,
+    Prefetch,
+    Q,
+)
+from django.db.models.functions import (
+    Cast,
+    Collate,
+    Lower,
+)
+
 from rest_framework import (
     viewsets,
     mixins,
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.encoders import JSONEncoder
 
+from core import cleanup
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
+    SEARCH_CONFIG,
 )
 from recipe import serializers
+from recipe.bulk import (
+    create_recipes,
+    update_recipes,
+)
+from recipe.caching import (
+    CachedReadMixin,
+    get_data_version,
+)
+from recipe.cards import (
+    CARD_COLUMNS,
+    CardListResponse,
+    deferred_card_refresh,
+    render_cards,
+    store_cards,
+)
+from recipe.identity import get_identity_map
+from recipe.pagination import (
+    NameCursorPagination,
+    RecipeCursorPagination,
+)
+from recipe.trie import get_trie
+
+
+@lru_cache(maxsize=None)
+def trigram_installed():
+    """Check if the pg_trgm extension is installed in the database"""
+    if connection.vendor != "postgresql":
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def _as_json_array(documents):
+    """Join JSON documents into a streamed JSON array"""
+    yield "["
+    for index, document in enumerate(documents):
+        yield f",{document}" if index else document
+    yield "]"
+
+
+RECIPE_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        "tags",
+        OpenApiTypes.STR,
+        description="Comma separated list of ID to filter"
+    ),
+    OpenApiParameter(
+        "tags_mode",
+        OpenApiTypes.STR,
+        enum=["any", "all"],
+        description="Match recipes having any (default) or all tags"
+    ),
+    OpenApiParameter(
+        "ingredients",
+        OpenApiTypes.STR,
+        description="Comma separated list of ID to filter"
+    ),
+    OpenApiParameter(
+        "ingredients_mode",
+        OpenApiTypes.STR,
+        enum=["any", "all"],
+        description="Match recipes having any (default) or all ingredients",
+    ),
+    OpenApiParameter(
+        "max_time",
+        OpenApiTypes.INT,
+        description="Only recipes taking at most this many minutes"
+    ),
+    OpenApiParameter(
+        "min_price",
+        OpenApiTypes.NUMBER,
+        description="Only recipes costing at least this much"
+    ),
+    OpenApiParameter(
+        "max_price",
+        OpenApiTypes.NUMBER,
+        description="Only recipes costing at most this much"
+    ),
+    OpenApiParameter(
+        "q",
+        OpenApiTypes.STR,
+        description="Search title and description, best match first"
+    ),
+]
+
+FIELDS_PARAMETER = OpenApiParameter(
+    "fields",
+    OpenApiTypes.STR,
+    description="Comma separated list of fields to return"
+)
 
 
 # Create your views here.
 @extend_schema_view(
     list=extend_schema(
-        parameters=[
+        parameters=RECIPE_FILTER_PARAMETERS + [
+            FIELDS_PARAMETER,
+            OpenApiParameter(
+                "highlight",
+                OpenApiTypes.INT,
+                enum=[0, 1],
+                description="Add highlighted snippet to search results"
+            ),
+        ]
+    ),
+    retrieve=extend_schema(
+        parameters=[FIELDS_PARAMETER]
+    ),
+    facets=extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS
+    ),
+    export=extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS + [
             OpenApiParameter(
-                "tags",
+                "export_format",
                 OpenApiTypes.STR,
-                description="Comma separated list of ID to filter"
+                enum=["json", "ndjson"],
+                description="JSON array (default) or one recipe per line"
             ),
+        ],
+        responses={200: serializers.RecipeDetailSerializer(many=True)},
+    ),
+    batch=extend_schema(
+        parameters=[
             OpenApiParameter(
-                "ingredients",
+                "ids",
                 OpenApiTypes.STR,
-                description="Comma separated list of ID to filter"
-            )
-        ]
-    )
+                required=True,
+                description="Comma separated list of recipe ID to fetch"
+            ),
+        ],
+    ),
+    bulk=extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS,
+        request=serializers.RecipeDetailSerializer(many=True),
+        responses={
+            200: serializers.RecipeDetailSerializer(many=True),
+            201: serializers.RecipeDetailSerializer(many=True),
+        },
+        description=(
+            "POST creates and PATCH updates a list of recipes, PATCH items "
+            "need an id. DELETE takes {\"ids\": [...]} or recipe filters."
+        ),
+    ),
+    import_recipes=extend_schema(
+        request={
+            "application/x-ndjson": serializers.RecipeDetailSerializer,
+        },
+        responses={200: serializers.RecipeImportResultSerializer},
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedReadMixin, viewsets.ModelViewSet):
     """Recipe View Set to manage APIs"""
     serializer_class = serializers.RecipeDetailSerializer
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.defer("search_vector", "card")
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    related_querysets = {
+        "tags": Tag.objects.only("id", "name").order_by("id"),
+        "ingredients": Ingredient.objects.only("id", "name").order_by("id"),
+    }
+    fast_list = True
+    range_filters = {
+        "max_time": ("time_minutes__lte", int),
+        "min_price": ("price__gte", Decimal),
+        "max_price": ("price__lte", Decimal),
+    }
+    export_chunk_size = 500
+    import_chunk_size = 500
+    bulk_max_batch_size = settings.RECIPE_BULK_MAX_BATCH_SIZE
+    batch_max_size = 100
+    cached_actions = ("list", "retrieve", "batch")
+    export_content_types = {
+        "json": "application/json",
+        "ndjson": "application/x-ndjson",
+    }
+
+    def dispatch(self, request, *args, **kwargs):
+        with deferred_card_refresh():
+            return super().dispatch(request, *args, **kwargs)
 
     def _params_to_int(self, qa):
         """Convert query string to integer"""
         return [int(str_id) for str_id in qa.split(",")]
 
+    def _filter_by_related(self, queryset, param, related_field):
+        """Filter recipes linked to any or all of the given ids"""
+        ids = set(self._params_to_int(self.request.query_params[param]))
+        mode = self.request.query_params.get(f"{param}_mode", "any")
+        through = getattr(Recipe, param).through
+        links = through.objects.filter(**{f"{related_field}__in": ids})
+
+        if mode == "any":
+            return queryset.filter(
+                Exists(links.filter(recipe_id=OuterRef("pk")))
+            )
+        if mode == "all":
+            matched = links.values("recipe_id").annotate(
+                matched=Count(related_field, distinct=True)
+            ).filter(matched=len(ids))
+            return queryset.filter(id__in=matched.values("recipe_id"))
+
+        raise ValidationError({f"{param}_mode": "Must be 'any' or 'all'"})
+
+    def _filter_by_range(self, queryset):
+        """Filter recipes by time and price bounds"""
+        for param, (lookup, convert) in self.range_filters.items():
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+
+            try:
+                value = convert(value)
+            except (ValueError, InvalidOperation):
+                raise ValidationError({param: "Must be a number"})
+            # Decimal accepts NaN and Infinity, which match every row
+            if isinstance(value, Decimal) and not value.is_finite():
+                raise ValidationError({param: "Must be a number"})
+            queryset = queryset.filter(**{lookup: value})
+
+        return queryset
+
+    def _has_filter(self):
+        """Check if the query string narrows down the recipes of the user"""
+        # get_queryset skips empty values, and modes only change how
+        # tags and ingredients match
+        return any(
+            self.request.query_params.get(parameter.name)
+            for parameter in RECIPE_FILTER_PARAMETERS
+            if not parameter.name.endswith("_mode")
+        )
+
+    def _highlight(self):
+        """Check if search results should include a snippet"""
+        value = self.request.query_params.get("highlight", "0")
+        if value not in ("0", "1"):
+            raise ValidationError({"highlight": "Must be 0 or 1"})
+
+        return value == "1"
+
+    def _search(self, queryset, text):
+        """Filter recipes matching text, best match first"""
+        if connection.vendor != "postgresql":
+            queryset = queryset.filter(
+                Q(title__icontains=text) | Q(description__icontains=text)
+            )
+            if self._highlight():
+                queryset = queryset.annotate(snippet=F("description"))
+
+            return queryset.order_by("-id")
+
+        query = SearchQuery(
+            text,
+            config=SEARCH_CONFIG,
+            search_type="websearch",
+        )
+        # ts_rank returns a real, cast so cursors round trip exactly
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(
+                SearchRank(F("search_vector"), query),
+                FloatField(),
+            ),
+        )
+        if self._highlight():
+            queryset = queryset.annotate(snippet=SearchHeadline(
+                "description",
+                query,
+                config=SEARCH_CONFIG,
+            ))
+
+        return queryset.order_by("-search_rank", "-id")
+
     def get_queryset(self):
         """Retuen only Recipe created by the user"""
-        tags = self.request.query_params.get("tags")
-        ingredients = self.request.query_params.get("ingredients")
         queryset = self.queryset
 
-        if tags:
-            tag_id = self._params_to_int(tags)
-            queryset = queryset.filter(tags__id__in=tag_id)
+        if self.request.query_params.get("tags"):
+            queryset = self._filter_by_related(queryset, "tags", "tag_id")
+
+        if self.request.query_params.get("ingredients"):
+            queryset = self._filter_by_related(
+                queryset,
+                "ingredients",
+                "ingredient_id",
+            )
+
+        queryset = self._filter_by_range(queryset)
+        queryset = queryset.filter(user=self.request.user)
+        if self.request.query_params.get("q"):
+            queryset = self._search(queryset, self.request.query_params["q"])
+        else:
+            queryset = queryset.order_by("-id")
+
+        related = list(self.related_querysets)
+        fields = self._get_requested_fields()
+        if fields is not None:
+            columns = {field.name for field in Recipe._meta.concrete_fields}
+            queryset = queryset.only("id", *(fields & columns))
+            related = [name for name in related if name in fields]
+
+        return queryset.prefetch_related(*[
+            Prefetch(name, queryset=self.related_querysets[name])
+            for name in related
+        ])
+
+    def _get_recipes(self, ids):
+        """Return recipes of the user by id with related names prefetched"""
+        return self.queryset.filter(
+            user=self.request.user,
+        ).prefetch_related(*[
+            Prefetch(name, queryset=queryset)
+            for name, queryset in self.related_querysets.items()
+        ]).in_bulk(ids)
 
-        if ingredients:
-            ingredient_id = self._params_to_int(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_id)
+    def _get_requested_fields(self):
+        """Return fields asked for with ?fields= on read actions"""
+        fields = self.request.query_params.get("fields")
+        if not fields or self.action not in ("list", "retrieve"):
+            return None
 
-        return queryset.filter(
-            user=self.request.user
-            ).order_by("-id").distinct()
+        requested = {name.strip() for name in fields.split(",")} - {""}
+        if not requested:
+            return None
+
+        unknown = requested - set(self.get_serializer_class().Meta.fields)
+        if unknown:
+            raise ValidationError(
+                {"fields": f"Unknown fields: {', '.join(sorted(unknown))}"}
+            )
+
+        return requested
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self._get_requested_fields()
+        if fields is not None:
+            kwargs["fields"] = fields
+
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
-        if self.action == "list":
+        if self.action == "facets":
+            return serializers.RecipeFacetsSerializer
+        elif self.action == "list":
+            if self.request.query_params.get("q") and self._highlight():
+                return serializers.RecipeSearchSerializer
             return serializers.RecipeSerializer
+        elif self.action == "batch":
+            return serializers.RecipeBatchSerializer
+        elif self.action == "import_recipes":
+            return serializers.RecipeImportResultSerializer
         elif self.action == "upload_image":
             return serializers.RecipeImageSerializer
 
         return self.serializer_class
 
+    def _use_fast_list(self):
+        """Check the list can skip serializers, see _fast_list"""
+        return (
+            self.fast_list
+            and self._get_requested_fields() is None
+            and self.get_serializer_class() is serializers.RecipeSerializer
+        )
+
+    def _fast_list(self, request):
+        """List recipes from stored cards, same output as RecipeSerializer"""
+        queryset = self.get_queryset().prefetch_related(None)
+        columns = CARD_COLUMNS + ["card"]
+        # Cursor positions are read from the ordering fields of the row
+        columns += [
+            field.lstrip("-")
+            for field in queryset.query.order_by
+            if field.lstrip("-") not in columns
+        ]
+        page = self.paginate_queryset(queryset.values(*columns))
+
+        missing = [row for row in page if row["card"] is None]
+        if missing:
+            cards = render_cards(missing)
+            store_cards([row["id"] for row in missing], cards)
+            for row, card in zip(missing, cards):
+                row["card"] = card
+
+        return CardListResponse(
+            self.get_paginated_response(None).data,
+            [row["card"] for row in page],
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self._use_fast_list():
+            return self.cached_read(self._fast_list, request)
+
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_read(super().retrieve, request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=["GET"], detail=False)
+    def facets(self, request):
+        """Count filtered recipes per tag and ingredient"""
+        recipes = self.get_queryset().values("id")
+        facets = {}
+        for name, related in [("tags", "tag"), ("ingredients", "ingredient")]:
+            through = getattr(Recipe, name).through
+            rows = through.objects.filter(recipe_id__in=recipes).values(
+                f"{related}_id",
+                f"{related}__name",
+            ).annotate(
+                count=Count("recipe_id"),
+            ).order_by("-count", f"{related}__name")
+            facets[name] = [
+                {
+                    "id": row[f"{related}_id"],
+                    "name": row[f"{related}__name"],
+                    "count": row["count"],
+                }
+                for row in rows
+            ]
+        serializer = self.get_serializer(facets)
+
+        return Response(serializer.data)
+
+    def _export_lines(self, queryset):
+        """Yield recipes as JSON documents, reading in chunks"""
+        for recipe in queryset.iterator(chunk_size=self.export_chunk_size):
+            yield json.dumps(self.get_serializer(recipe).data, cls=JSONEncoder)
+
+    @action(methods=["GET"], detail=False)
+    def export(self, request):
+        """Stream all filtered recipes of the user"""
+        export_format = request.query_params.get("export_format", "json")
+        if export_format not in self.export_content_types:
+            raise ValidationError(
+                {"export_format": "Must be 'json' or 'ndjson'"}
+            )
+
+        lines = self._export_lines(self.get_queryset())
+        if export_format == "json":
+            content = _as_json_array(lines)
+        else:
+            content = (f"{line}\n" for line in lines)
+
+        response = StreamingHttpResponse(
+            content,
+            content_type=self.export_content_types[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="recipes.{export_format}"'
+        )
+
+        return response
+
+    def _import_chunk(self, lines):
+        """Validate and insert one chunk of numbered NDJSON lines"""
+        results = []
+        valid = []
+        for number, line in lines:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                results.append({
+                    "line": number,
+                    "errors": {"non_field_errors": ["Invalid JSON"]},
+                })
+                continue
+
+            serializer = serializers.RecipeDetailSerializer(data=data)
+            if serializer.is_valid():
+                valid.append((number, serializer.validated_data))
+            else:
+                results.append({"line": number, "errors": serializer.errors})
+
+        with transaction.atomic():
+            recipes = create_recipes(
+                self.request.user,
+                [data for number, data in valid],
+                get_identity_map(self.request),
+            )
+        results.extend(
+            {"line": number, "id": recipe.id}
+            for (number, data), recipe in zip(valid, recipes)
+        )
+
+        return sorted(results, key=lambda result: result["line"])
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="import",
+        url_name="import",
+    )
+    def import_recipes(self, request):
+        """Create recipes from an NDJSON body, one recipe per line"""
+        results = []
+        chunk = []
+        for number, line in enumerate(request.stream or [], start=1):
+            if not line.strip():
+                continue
+            chunk.append((number, line))
+            if len(chunk) == self.import_chunk_size:
+                results.extend(self._import_chunk(chunk))
+                chunk = []
+        if chunk:
+            results.extend(self._import_chunk(chunk))
+
+        serializer = self.get_serializer({
+            "created": sum("id" in result for result in results),
+            "results": results,
+        })
+
+        return Response(serializer.data)
+
+    def _check_batch_size(self, size):
+        if size > self.bulk_max_batch_size:
+            raise ValidationError({"non_field_errors": [
+                f"At most {self.bulk_max_batch_size} recipes per request"
+            ]})
+
+    def _bulk_items(self, request):
+        """Return the list of recipes in the request body"""
+        if not isinstance(request.data, list):
+            raise ValidationError(
+                {"non_field_errors": ["Expected a list of recipes"]}
+            )
+        self._check_batch_size(len(request.data))
+
+        return request.data
+
+    def _bulk_response(self, ids, status_code=status.HTTP_200_OK):
+        recipes = self._get_recipes(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids],
+            many=True,
+        )
+
+        return Response(serializer.data, status=status_code)
+
+    def _bulk_create(self, request):
+        serializer = self.get_serializer(
+            data=self._bulk_items(request),
+            many=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            recipes = create_recipes(
+                request.user,
+                serializer.validated_data,
+                get_identity_map(request),
+            )
+
+        return self._bulk_response(
+            [recipe.id for recipe in recipes],
+            status.HTTP_201_CREATED,
+        )
+
+    def _bulk_update(self, request):
+        items = self._bulk_items(request)
+        ids = [
+            item.get("id") if isinstance(item, dict) else None
+            for item in items
+        ]
+        # bool is a subclass of int, but true is not a recipe id
+        if not all(type(pk) is int for pk in ids):
+            raise ValidationError({"id": ["Each recipe needs an integer id"]})
+        if len(set(ids)) != len(ids):
+            raise ValidationError({"id": ["Recipe ids must be unique"]})
+
+        serializer = self.get_serializer(data=items, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            recipes = self.queryset.filter(
+                user=request.user,
+            ).select_for_update().in_bulk(ids)
+            missing = [pk for pk in ids if pk not in recipes]
+            if missing:
+                raise ValidationError(
+                    {"id": [f"Recipes not found: {missing}"]}
+                )
+            update_recipes(
+                request.user,
+                [recipes[pk] for pk in ids],
+                serializer.validated_data,
+                get_identity_map(request),
+            )
+
+        return self._bulk_response(ids)
+
+    def _bulk_delete(self, request):
+        ids = None
+        if isinstance(request.data, dict):
+            ids = request.data.get("ids")
+
+        if ids is not None:
+            if not isinstance(ids, list) or not all(
+                type(pk) is int for pk in ids
+            ):
+                raise ValidationError({"ids": ["Expected a list of ids"]})
+            self._check_batch_size(len(ids))
+        elif self._has_filter():
+            ids = list(self.get_queryset().values_list(
+                "id",
+                flat=True,
+            )[:self.bulk_max_batch_size + 1])
+            self._check_batch_size(len(ids))
+        else:
+            raise ValidationError({"non_field_errors": [
+                "Pass ids in the body or a filter in the query string"
+            ]})
+
+        with transaction.atomic():
+            deleted, per_model = self.queryset.filter(
+                user=request.user,
+                id__in=ids,
+            ).delete()
+
+        return Response({"deleted": per_model.get(Recipe._meta.label, 0)})
+
+    def _batch(self, request):
+        try:
+            ids = list(dict.fromkeys(
+                self._params_to_int(request.query_params.get("ids", ""))
+            ))
+        except ValueError:
+            raise ValidationError({"ids": ["Expected comma separated ids"]})
+        if len(ids) > self.batch_max_size:
+            raise ValidationError(
+                {"ids": [f"At most {self.batch_max_size} ids per request"]}
+            )
+
+        recipes = self._get_recipes(ids)
+        serializer = self.get_serializer({
+            "results": [recipes[pk] for pk in ids if pk in recipes],
+            "missing": [pk for pk in ids if pk not in recipes],
+        })
+
+        return Response(serializer.data)
+
+    @action(methods=["GET"], detail=False)
+    def batch(self, request):
+        """Fetch recipes by id list in the requested order"""
+        return self.cached_read(self._batch, request)
+
+    @action(methods=["POST", "PATCH", "DELETE"], detail=False)
+    def bulk(self, request):
+        """Create, update or delete many recipes in one transaction"""
+        if request.method == "POST":
+            return self._bulk_create(request)
+        elif request.method == "PATCH":
+            return self._bulk_update(request)
+
+        return self._bulk_delete(request)
+
     @action(methods=["POST"], detail=True, url_path="upload_image")
     def upload_image(self, request, pk=None):
         """Uplaod image to recipe"""
@@ -103,11 +739,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT,
                 enum=[0, 1],
                 description="Filter by items assigned to recipe",
-            )
+            ),
+            OpenApiParameter(
+                "search",
+                OpenApiTypes.STR,
+                description="Fuzzy match on name, best matches first",
+            ),
         ]
     )
 )
 class BaseRecipeAttrViewSet(
+    CachedReadMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
     mixins.DestroyModelMixin,
@@ -116,19 +758,116 @@ class BaseRecipeAttrViewSet(
     """Base Attribute Recipe Class"""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = NameCursorPagination
+    search_limit = 20
+    autocomplete_limit = 10
+    trie_max_size = 10000
+
+    def _search(self, queryset, text):
+        """Return top matches for text, most similar first"""
+        if trigram_installed():
+            queryset = queryset.filter(name__trigram_similar=text).annotate(
+                similarity=TrigramSimilarity("name", text),
+            ).order_by("-similarity", "name")
+        else:
+            queryset = queryset.filter(name__icontains=text).order_by("name")
+
+        return queryset[:self.search_limit]
+
+    def _search_text(self):
+        if self.action == "list":
+            return self.request.query_params.get("search")
+
+        return None
 
     def get_queryset(self):
         """Override queryset to return user specific attributes only"""
         assigned_only = bool(
             int(self.request.query_params.get("assigned_only", 0))
         )
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            model = queryset.model
+            # Semi-join stops at the first link instead of deduplicating
+            queryset = queryset.filter(Exists(
+                model.recipe_set.through.objects.filter(**{
+                    f"{model._meta.model_name}_id": OuterRef("pk"),
+                })
+            ))
+
+        search = self._search_text()
+        if search:
+            return self._search(queryset, search)
+
+        return queryset.order_by("-name", "-id")
+
+    def paginate_queryset(self, queryset):
+        """Search answers with a single page of its top matches"""
+        if self._search_text():
+            return list(queryset)
+
+        return super().paginate_queryset(queryset)
+
+    def get_paginated_response(self, data):
+        if self._search_text():
+            return Response({"next": None, "previous": None, "results": data})
+
+        return super().get_paginated_response(data)
+
+    def get_serializer_class(self):
+        if self.action == "merge_duplicates":
+            return serializers.MergeDuplicatesSerializer
+
+        return self.serializer_class
+
+    @action(methods=["POST"], detail=False, url_path="merge-duplicates")
+    def merge_duplicates(self, request):
+        """Merge names differing only in case, whitespace or plural"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        merged, _, _ = cleanup.merge_duplicates(
+            self.queryset.model,
+            request.user,
+            serializer.validated_data["fold_plurals"],
+        )
+        serializer = self.get_serializer({"merged": merged})
+
+        return Response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "prefix",
+                OpenApiTypes.STR,
+                description="Case insensitive start of the name",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False)
+    def autocomplete(self, request):
+        """Complete names starting with prefix"""
+        prefix = request.query_params.get("prefix", "")
+        version = get_data_version(request.user.id)
+        trie = get_trie(
+            self.queryset.model,
+            request.user.id,
+            self.trie_max_size,
+            version,
+        )
+        if trie is not None:
+            return Response(trie.complete(prefix, self.autocomplete_limit))
+
+        # Code point order of lower case names, like the trie
+        queryset = self.queryset.filter(
+            user=request.user,
+            name__istartswith=prefix,
+        ).order_by(
+            Collate(Lower("name"), "C"),
+            "id",
+        )[:self.autocomplete_limit]
+        serializer = self.get_serializer(queryset, many=True)
 
-        return queryset.filter(
-            user=self.request.user
-            ).order_by("-name").distinct()
+        return Response(serializer.data)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):